@@ -0,0 +1,121 @@
+import csv
+import datetime
+import os
+import threading
+import time
+from collections import namedtuple
+
+DEFAULT_ASSIGNMENTS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "Data", "aircraft_inspection_assignments.csv"
+)
+
+Assignment = namedtuple(
+    "Assignment", ["inspector_name", "inspector_id", "aircraft_id", "date", "shift", "inspection_zone", "location"]
+)
+
+# user_info keys the mobile app / supervisor may use for the inspector; a bare "id"
+# is deliberately not one, as it is as likely to be some other record's row id
+INSPECTOR_ID_KEYS = ("inspector_id", "Inspector ID", "employee_id")
+
+
+def parse_date(value):
+    """Accepts the CSV's M/D/YYYY as well as ISO dates; returns a date or None."""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    value = str(value or "").strip()
+    try:
+        return datetime.datetime.fromisoformat(value).date()
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.strptime(value, "%m/%d/%Y").date()
+    except ValueError:
+        return None
+
+
+def inspector_id_from(user_info):
+    for key in INSPECTOR_ID_KEYS:
+        if user_info.get(key):
+            return str(user_info[key]).strip()
+    return None
+
+
+class AssignmentIndex:
+    """
+    In-memory {(inspector ID, date): Assignment} index over the assignments CSV.
+
+    Lookups are a single dict access. The file's mtime is re-checked at most
+    every check_interval seconds and the index is rebuilt and swapped in when
+    it changes, so edits are picked up without a restart.
+    """
+
+    def __init__(self, path=None, check_interval=5.0):
+        self.path = path or os.environ.get("ASSIGNMENTS_PATH", DEFAULT_ASSIGNMENTS_PATH)
+        self.check_interval = check_interval
+        self._by_key = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._reload_if_changed(force=True)
+
+    def _load(self):
+        by_key = {}
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                inspector_id = (row.get("Inspector ID") or "").strip()
+                date = parse_date(row.get("Date Assigned"))
+                if not inspector_id or date is None:
+                    continue  # blank padding rows
+                by_key[(inspector_id, date)] = Assignment(
+                    row["Inspector Name"].strip(),
+                    inspector_id,
+                    row["Aircraft ID"].strip(),
+                    date,
+                    row["Shift"].strip(),
+                    row["Inspection Zone"].strip(),
+                    row["Location"].strip(),
+                )
+        return by_key
+
+    def _reload_if_changed(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                print(f"WARNING: Assignments file unavailable: {e}")
+                return
+            if mtime != self._mtime:
+                self._by_key = self._load()
+                self._mtime = mtime
+                print(f"---FORMS AGENT: Loaded {len(self._by_key)} inspection assignments---")
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def lookup(self, inspector_id, date=None):
+        """Returns the Assignment for inspector_id on date (default today), or None."""
+        self._reload_if_changed()
+        date = parse_date(date) if date else datetime.date.today()
+        if not inspector_id or date is None:
+            return None
+        return self._by_key.get((str(inspector_id).strip(), date))
+
+    def lookup_user(self, user_info):
+        """Resolves the assignment for a supervisor user_info dict."""
+        if not isinstance(user_info, dict) or not user_info:
+            return None
+        return self.lookup(inspector_id_from(user_info), user_info.get("date"))
+
+
+def apply_assignment(form, assignment):
+    """Overwrites the form's aircraft/zone fields with the known assignment."""
+    if assignment is not None:
+        form["aircraft_id"] = assignment.aircraft_id
+        form["inspection_zone"] = assignment.inspection_zone
+    return form
@@ -1,22 +1,105 @@
 import os
+import sys
 import requests
 from flask import Flask, request, jsonify
 from dotenv import load_dotenv
 from jinja2 import Template
-import google.generativeai as genai
 import datetime
+import json
+from assignments import AssignmentIndex, apply_assignment
+from precedents import PrecedentIndex, fill_from_precedent
+
+# Modules shared by all agents live in "agents modeling/shared"
+sys.path.append(os.environ.get(
+    "AGENTS_SHARED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared")
+))
+from agent_http import AgentHttpClient, Budget
+from instrumentation import call_llm, install_flask
+from startup import LazyResource, StartupProfile, install_health_endpoints, warm_up
+
+startup = StartupProfile("forms")
 
 # --- Initialize Flask App and Load Environment Variables ---
 app = Flask(__name__)
+install_flask(app, "forms")
 load_dotenv()
 
+def load_genai():
+    """Imports and configures the Gemini SDK (slow to import, so done after startup)."""
+    import google.generativeai as genai
+    try:
+        genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+    except KeyError:
+        print("FATAL ERROR: GEMINI_API_KEY environment variable not set.")
+    return genai
+
+gemini = LazyResource("gemini", load_genai, startup)
+
+# --- Retrieval Configuration ---
+# "remote" calls the MCP /query endpoint; "local" embeds the mcp_server corpus
+# and retrieval code in this process and skips both extra LLM calls.
+MCP_MODE = os.environ.get("MCP_MODE", "remote").lower()
+MCP_URL = os.environ.get("MCP_URL", "https://airline-mcp-app.us-central1.run.app/query") # removed detail
+MCP_SERVER_DIR = os.environ.get(
+    "MCP_SERVER_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "mcp_server")
+)
+MCP_BUCKET = os.environ.get("MCP_BUCKET", "airline_data_mcp")
+
+# Used when the caller sends no X-Request-Deadline header
+FORMS_BUDGET_SECONDS = float(os.environ.get("FORMS_BUDGET_SECONDS", 90))
+http_client = AgentHttpClient(timeout=float(os.environ.get("MCP_TIMEOUT_SECONDS", 60)))
+
+
+# --- Precedent Fast Path ---
+# Detections that closely match a known report are filled without the LLM; held-out
+# paraphrases of the precedents score 0.70-0.95 (see tests/test_precedents.py)
+PRECEDENT_MIN_SCORE = float(os.environ.get("PRECEDENT_MIN_SCORE", 0.6))
+try:
+    precedent_index = PrecedentIndex.from_file()
+except (OSError, ValueError) as e:
+    print(f"WARNING: Precedent index unavailable, always using the LLM: {e}")
+    precedent_index = None
+
+# --- Inspector Assignments ---
+# Fills aircraft_id / inspection_zone from the inspector's assignment for the day
 try:
-    genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-except KeyError:
-    print("FATAL ERROR: GEMINI_API_KEY environment variable not set.")
+    assignment_index = AssignmentIndex()
+except (OSError, KeyError) as e:
+    print(f"WARNING: Assignment index unavailable, aircraft fields left to the LLM: {e}")
+    assignment_index = None
+
+
+def load_local_corpus():
+    """Loads the mcp_server corpus into this process."""
+    if MCP_SERVER_DIR not in sys.path:
+        sys.path.insert(0, MCP_SERVER_DIR)
+    from doc_cache import DocumentCache
+    from manual_loader import load_corpus
+
+    return load_corpus(MCP_BUCKET, cache=DocumentCache())
+
+local_corpus = LazyResource("local_corpus", load_local_corpus, startup)
+
+
+def get_local_corpus():
+    """The in-process corpus, loaded on first use or during warm-up."""
+    return local_corpus.get()
 
 
-def retrieve_from_mcp(text: str) -> str:
+def retrieve_locally(text: str) -> str:
+    """
+    Looks up MCP context in-process: the damage description is ranked directly
+    against the combined corpus, so no query-writing or answering LLM call is made.
+    """
+    print(f"---FORMS AGENT: Retrieving local MCP context for: '{text[:50]}...'---")
+    # Loading the corpus also puts the mcp_server modules on sys.path
+    corpus = get_local_corpus()
+    from prompt_utils import build_context
+
+    return build_context(text, corpus.combined)
+
+
+def retrieve_from_mcp(text: str, budget: Budget = None) -> str:
     """
     Generates a query from text and retrieves data from the MCP system.
     (This function assumes your prompt files are in a './Prompts' directory)
@@ -38,26 +121,29 @@ def retrieve_from_mcp(text: str) -> str:
     
     """
 
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    query_response = model.generate_content(filled_prompt)
+    model = gemini.get().GenerativeModel('gemini-2.5-flash')
+    query_response = call_llm('gemini-2.5-flash', "mcp_query", model.generate_content, filled_prompt)
 
     payload = {"query": query_response.text}
     headers = {"Content-Type": "application/json"}
-    mcp_url = "https://airline-mcp-app.us-central1.run.app/query" # removed detail
+    mcp_url = MCP_URL
 
     if not mcp_url:
         raise ValueError("MCP_URL environment variable is not set.")
 
-    mcp_response = requests.post(mcp_url, json=payload, headers=headers)
+    mcp_response = http_client.post(mcp_url, json=payload, headers=headers, budget=budget, idempotent=True)
     mcp_response.raise_for_status()  # Will raise an error for bad responses
     return mcp_response.json()["response"]
 
-def generate_form(mcp_data: str) -> str:
+def generate_form(mcp_data: str, assignment=None) -> str:
     """
     Generates a structured form from the MCP context data.
+    A known inspector assignment is pre-filled and enforced on the result.
     """
     print(f"---FORMS AGENT: Generating form from MCP data...---")
     todays_date = datetime.datetime.now()
+    aircraft_id = assignment.aircraft_id if assignment else "_____"
+    inspection_zone = assignment.inspection_zone if assignment else "_____"
     filled_prompt = f"""
         Context: You are a helpful assistant to a flight attendant. You are receiving data with relevant
         information on what to do with a broken seat as well as which form to use.
@@ -73,8 +159,8 @@ def generate_form(mcp_data: str) -> str:
         {{
             "form_id": "_____",
             "date": "_____",
-            "aircraft_id": "_____",
-            "inspection_zone": "_____",
+            "aircraft_id": "{aircraft_id}",
+            "inspection_zone": "{inspection_zone}",
             "issue_type": "_____",
             "issue_description": "_____",
             "severity": "_____",
@@ -86,27 +172,50 @@ def generate_form(mcp_data: str) -> str:
         Do not include ```json``` in your response.
     """
     
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    form_response = model.generate_content(filled_prompt)
+    model = gemini.get().GenerativeModel('gemini-2.5-flash')
+    form_response = call_llm('gemini-2.5-flash', "generate_form", model.generate_content, filled_prompt)
 
-    return form_response.text
+    if assignment is None:
+        return form_response.text
+    try:
+        form = json.loads(form_response.text.strip().removeprefix("```json").removesuffix("```"))
+    except json.JSONDecodeError:
+        return form_response.text
+    return json.dumps(apply_assignment(form, assignment), indent=4)
 
 @app.route("/generate_form", methods=["POST"])
 def generate_form_endpoint():
     """
     The main API endpoint for the forms agent.
-    Expects a JSON payload with 'item', 'description', and 'priority'.
+    Expects a JSON payload with 'item', 'description', and 'priority',
+    and optionally the supervisor's 'user_info' to resolve the aircraft.
     """
     try:
         data = request.get_json()
         if not data or not all(key in data for key in ["item", "description", "priority"]):
             return jsonify({"error": "Missing required fields: 'item', 'description', and 'priority'."}), 400
 
+        assignment = None
+        if assignment_index is not None:
+            assignment = assignment_index.lookup_user(data.get("user_info"))
+
+        if precedent_index is not None:
+            score, precedent = precedent_index.best_match(data["item"], data["description"])
+            if score >= PRECEDENT_MIN_SCORE:
+                print(f"---FORMS AGENT: Precedent match '{precedent['Issue Type']}' (score {score:.2f}), skipping LLM---")
+                form = fill_from_precedent(precedent, data["description"], datetime.datetime.now())
+                apply_assignment(form, assignment)
+                return jsonify({"generated_form": json.dumps(form, indent=4)})
+
         damage_details_text = f"Item: {data['item']}. Priority: {data['priority']}. Description: {data['description']}"
 
-        mcp_context = retrieve_from_mcp(damage_details_text)
+        if MCP_MODE == "local":
+            mcp_context = retrieve_locally(damage_details_text)
+        else:
+            budget = Budget.from_headers(request.headers, FORMS_BUDGET_SECONDS)
+            mcp_context = retrieve_from_mcp(damage_details_text, budget)
 
-        generated_form_text = generate_form(mcp_context)
+        generated_form_text = generate_form(mcp_context, assignment)
 
         return jsonify({"generated_form": generated_form_text})
 
@@ -119,6 +228,17 @@ def generate_form_endpoint():
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+@app.route("/http_stats", methods=["GET"])
+def http_stats_endpoint():
+    """Connection pool, retry and circuit breaker counters for the MCP server."""
+    return jsonify(http_client.stats())
+
+# Local mode also needs the corpus before it can answer; remote mode only the SDK
+warmup_resources = [gemini, local_corpus] if MCP_MODE == "local" else [gemini]
+install_health_endpoints(app, warmup_resources, startup)
+warm_up(*warmup_resources)
+startup.mark("module_loaded")
+
 # --- Start Flask App ---
 if __name__ == "__main__":
     # Run the app on the requested port 8086
@@ -0,0 +1,142 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+
+DEFAULT_PRECEDENTS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "Data", "synthetic_interior_forms.json"
+)
+
+TOKEN_PATTERN = re.compile(r"[a-z]+")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has in is it its of on or the this to with
+item priority description seat row side not no very
+""".split())
+
+# Damage wordings folded together so "torn" agrees with a precedent's "Tear"
+DAMAGE_SYNONYMS = {
+    "torn": "tear", "ripped": "tear", "rip": "tear",
+    "cracked": "crack",
+    "jammed": "stuck",
+    "broken": "damaged",
+    "leaking": "leak", "leaky": "leak", "dripping": "leak",
+    "clogged": "blocked", "obstructed": "blocked", "blocking": "blocked",
+    "dented": "dent",
+    "stained": "stain",
+}
+
+# Report fields copied verbatim from a confident precedent match
+PRECEDENT_FIELDS = {
+    "form_id": "Form ID",
+    "issue_type": "Issue Type",
+    "severity": "Severity",
+    "action_taken": "Action Taken",
+    "department_contacted": "Department Contacted",
+}
+
+
+def tokenize(text):
+    terms = []
+    for term in TOKEN_PATTERN.findall(text.lower()):
+        if term in STOPWORDS or len(term) < 3:
+            continue
+        # Crude plural folding so "latches" matches "latch"
+        if len(term) > 4 and term.endswith("es") and not term.endswith("ses"):
+            term = term[:-2]
+        elif len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(DAMAGE_SYNONYMS.get(term, term))
+    return terms
+
+
+class PrecedentIndex:
+    """
+    TF-IDF cosine index over the precedent reports in synthetic_interior_forms.json.
+
+    Each report is indexed by its section, issue type (weighted double) and
+    description; document vectors are L2-normalised up front so a lookup is a
+    sparse dot product over the query's postings.
+
+    A precedent only matches when every term of its issue type (both the
+    damage and the part, e.g. "Cracked Panel Light") appears in the query,
+    so the same part with different damage never takes the fast path.
+    """
+
+    def __init__(self, reports):
+        self.reports = reports
+        term_counts = [Counter(tokenize(self._report_text(report))) for report in reports]
+
+        n = len(reports)
+        document_frequency = Counter(term for counts in term_counts for term in counts)
+        self.idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+        # term -> list of (report index, normalised weight)
+        self.postings = {}
+        for report_id, counts in enumerate(term_counts):
+            weights = {term: (1 + math.log(tf)) * self.idf[term] for term, tf in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term, weight in weights.items():
+                self.postings.setdefault(term, []).append((report_id, weight / norm))
+
+    @staticmethod
+    def _report_text(report):
+        return " ".join([
+            report.get("Section", ""),
+            report.get("Issue Type", ""),
+            report.get("Issue Type", ""),
+            report.get("Issue Description", ""),
+        ])
+
+    @classmethod
+    def from_file(cls, path=None):
+        path = path or os.environ.get("PRECEDENTS_PATH", DEFAULT_PRECEDENTS_PATH)
+        with open(path, encoding="utf-8") as f:
+            sections = json.load(f)
+        reports = [
+            {"Section": section["Section"], **report}
+            for section in sections
+            for report in section.get("Reports", [])
+        ]
+        return cls(reports)
+
+    def best_match(self, item, description):
+        """Returns (score, report) for the most similar agreeing precedent, or (0.0, None)."""
+        counts = Counter(tokenize(f"{item} {description}"))
+        weights = {
+            term: (1 + math.log(tf)) * self.idf[term]
+            for term, tf in counts.items()
+            if term in self.idf
+        }
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        if not norm:
+            return 0.0, None
+
+        scores = Counter()
+        for term, weight in weights.items():
+            for report_id, doc_weight in self.postings[term]:
+                scores[report_id] += weight / norm * doc_weight
+
+        for report_id, score in scores.most_common():
+            if set(tokenize(self.reports[report_id].get("Issue Type", ""))) <= counts.keys():
+                return score, self.reports[report_id]
+        return 0.0, None
+
+
+def fill_from_precedent(report, description, todays_date):
+    """Builds the 10-field form from a precedent report without calling the LLM."""
+    form = {
+        "form_id": "N/A",
+        "date": str(todays_date),
+        "aircraft_id": "N/A",
+        "inspection_zone": "N/A",
+        "issue_type": "N/A",
+        "issue_description": description,
+        "severity": "N/A",
+        "action_taken": "N/A",
+        "department_contacted": "N/A",
+        "status": "open",
+    }
+    for field, source in PRECEDENT_FIELDS.items():
+        form[field] = report.get(source) or "N/A"
+    return form
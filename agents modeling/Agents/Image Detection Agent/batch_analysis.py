@@ -0,0 +1,100 @@
+import json
+
+PRIORITIES = ("None", "Low", "Medium", "High", "Severe")
+BBOX_KEYS = ("x_min", "y_min", "x_max", "y_max")
+# Label text and JSON framing that accompany each inline image part
+PART_OVERHEAD_BYTES = 256
+
+
+def encoded_size(size: int) -> int:
+    """Bytes an inline image part of `size` raw bytes takes once base64-encoded."""
+    return 4 * ((size + 2) // 3) + PART_OVERHEAD_BYTES
+
+
+def pack_batches(images, max_images: int, max_bytes: int, prompt_bytes: int = 0):
+    """
+    Greedily packs (key, model_bytes, mime_type) images into as few groups as
+    possible, each holding at most max_images images. max_bytes bounds the
+    encoded request: the prompt plus every image as base64.
+    """
+    batches = []
+    current, current_bytes = [], prompt_bytes
+    for image in images:
+        size = encoded_size(len(image[1]))
+        if current and (len(current) >= max_images or current_bytes + size > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], prompt_bytes
+        current.append(image)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_contents(prompt_text: str, batch):
+    """Interleaves a label before each image so answers can be matched back."""
+    contents = [prompt_text]
+    for position, (_, model_bytes, mime_type) in enumerate(batch, start=1):
+        contents.append(f"Image {position}:")
+        contents.append({"mime_type": mime_type, "data": model_bytes})
+    return contents
+
+
+def validate_analysis(analysis):
+    """Returns a cleaned single-image analysis, or None if it breaks the schema."""
+    if not isinstance(analysis, dict):
+        return None
+    if not all(isinstance(analysis.get(key), str) and analysis[key].strip() for key in ("type", "item", "description")):
+        return None
+    if analysis.get("priority") not in PRIORITIES:
+        return None
+
+    bbox = analysis.get("bbox")
+    if isinstance(bbox, str) and bbox.lower() == "none":
+        bbox = "none"
+    elif isinstance(bbox, dict):
+        try:
+            bbox = {key: float(bbox[key]) for key in BBOX_KEYS}
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not all(0.0 <= value <= 1.0 for value in bbox.values()):
+            return None
+        if bbox["x_min"] > bbox["x_max"] or bbox["y_min"] > bbox["y_max"]:
+            return None
+    else:
+        return None
+
+    return {
+        "type": analysis["type"],
+        "item": analysis["item"],
+        "description": analysis["description"],
+        "priority": analysis["priority"],
+        "bbox": bbox,
+    }
+
+
+def split_batch_response(response_text: str, batch_size: int):
+    """
+    Parses the model's JSON array into {position: analysis} for the entries that
+    validate; positions are 1-based. Missing or invalid entries are left out so
+    the caller can retry those images individually.
+    """
+    json_str = response_text.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    try:
+        entries = json.loads(json_str)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(entries, list):
+        return {}
+
+    results = {}
+    for fallback_position, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            continue
+        position = entry.get("image_index", fallback_position)
+        if not isinstance(position, int) or not 1 <= position <= batch_size or position in results:
+            continue
+        analysis = validate_analysis(entry)
+        if analysis is not None:
+            results[position] = analysis
+    return results
@@ -1,41 +1,132 @@
 import os
+import sys
 import json
 import io
 import base64
 from typing import TypedDict
 from PIL import Image, ImageDraw
+from image_preprocessing import map_bbox_to_original, prepare_for_model, sniff_mime_type
+from phash_cache import PerceptualHashCache, dhash
+from batch_analysis import build_batch_contents, pack_batches, split_batch_response
 
 from flask import Flask, request, jsonify
-from langgraph.graph import StateGraph, END
-import google.generativeai as genai
+
+# Modules shared by all agents live in "agents modeling/shared"
+sys.path.append(os.environ.get(
+    "AGENTS_SHARED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared")
+))
+from instrumentation import call_llm, install_flask, traced_node
+from startup import LazyResource, StartupProfile, install_health_endpoints, warm_up
+
+startup = StartupProfile("image_detection")
 
 # --- Configuration ---
-try:
-    genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
-except KeyError:
-    print("ERROR: GOOGLE_API_KEY environment variable not set.")
-    pass
+def load_genai():
+    """Imports and configures the Gemini SDK (slow to import, so done after startup)."""
+    import google.generativeai as genai
+    try:
+        genai.configure(api_key=os.environ["GOOGLE_API_KEY"])
+    except KeyError:
+        print("ERROR: GOOGLE_API_KEY environment variable not set.")
+    return genai
+
+gemini = LazyResource("gemini", load_genai, startup)
+
+# Image sent to the model: longest edge, encoding and JPEG/WebP quality
+IMAGE_MAX_EDGE = int(os.environ.get("IMAGE_MAX_EDGE", 1024))
+IMAGE_OUTPUT_FORMAT = os.environ.get("IMAGE_OUTPUT_FORMAT", "JPEG")
+IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", 85))
+
+# Near-duplicate photos (within PHASH_MAX_DISTANCE bits) reuse a stored analysis
+analysis_cache = PerceptualHashCache(
+    max_entries=int(os.environ.get("PHASH_CACHE_SIZE", 1024)),
+    max_distance=int(os.environ.get("PHASH_MAX_DISTANCE", 6)),
+)
+
+# Multi-image calls: images and (preprocessed) bytes packed into one request.
+# The byte limit counts the base64-encoded request, which Gemini caps at 20 MB inline.
+BATCH_MAX_IMAGES_PER_CALL = int(os.environ.get("BATCH_MAX_IMAGES_PER_CALL", 8))
+BATCH_MAX_BYTES_PER_CALL = int(os.environ.get("BATCH_MAX_BYTES_PER_CALL", 18 * 1024 * 1024))
+
+BATCH_PROMPT_TEMPLATE = """
+    You are an expert aviation maintenance inspector. You will receive {count} images, each preceded by a label "Image <n>:".
+    Analyze every image independently and provide the analysis for each in a JSON format.
+
+    For each image, follow these steps carefully:
+    1.  **Identify Item:** Identify the primary object in the image (e.g., "overhead bin", "suitcase", "winglet", "fuselage panel").
+    2.  **Categorize Type:** Classify the issue into one of three categories: "Damaged Baggage", "Damaged Aircraft Infrastructure", or "Lost Baggage". If the image shows a suitcase or personal bag, use "Damaged Baggage". If it shows a part of the plane, use "Damaged Aircraft Infrastructure".
+    3.  **Locate Damage:** Mentally identify the most severe damage in the image.
+
+    Return only a JSON array with exactly {count} objects, one per image in order, each with the following keys:
+        * `"image_index"`: The image number from its label (1 to {count}).
+        * `"type"`: The category you identified in step 2.
+        * `"item"`: The name of the aircraft part or baggage you identified.
+        * `"description"`: A brief, clear description of the damage you identified.
+        * `"priority"`: A severity level: "Low", "Medium", "High", or "Severe".
+        * `"bbox"`: A bounding box object with `x_min`, `y_min`, `x_max`, `y_max` coordinates as percentages (0.0 to 1.0) of that image that **precisely and tightly** encloses the damage.
+
+    Example for two images:
+    [{{"image_index": 1, "type": "Damaged Aircraft Infrastructure", "item": "Overhead compartment latch", "description": "The latch mechanism is broken and hanging loose.", "priority": "Medium", "bbox": {{"x_min": 0.45, "y_min": 0.55, "x_max": 0.6, "y_max": 0.65}}}},
+     {{"image_index": 2, "type": "Damaged Baggage", "item": "Blue suitcase", "description": "Large crack across the front shell.", "priority": "High", "bbox": {{"x_min": 0.2, "y_min": 0.3, "x_max": 0.8, "y_max": 0.7}}}}]
+
+    If an image shows no damage, use "description": "No damage detected.", "priority": "None" and "bbox": "none" for it.
+    """
 
 # --- Initialize Flask App ---
 app = Flask(__name__, static_url_path='', static_folder='static')
+install_flask(app, "image_detection")
 
 # --- LangGraph State Definition ---
 class AgentState(TypedDict):
     image_bytes: bytes
+    # Content type declared by the upload, used if the bytes cannot be decoded
+    image_mime_type: str
+    model_image_bytes: bytes
+    model_mime_type: str
+    exif_orientation: int
+    original_size: tuple
     model_response: dict
     error_message: str
 
 # --- LangGraph Node Functions ---
+def preprocess_image(state: AgentState):
+    """
+    Sniffs the upload's real format, applies EXIF orientation, downsizes and
+    re-encodes it so the model call carries a compact, correctly labelled image.
+    """
+    print("---PREPROCESSING IMAGE---")
+    image_bytes = state.get("image_bytes")
+    if not image_bytes:
+        return {"error_message": "No image found in state."}
+    try:
+        model_bytes, mime_type, orientation, original_size = prepare_for_model(
+            image_bytes, IMAGE_MAX_EDGE, IMAGE_OUTPUT_FORMAT, IMAGE_QUALITY
+        )
+    except Exception as e:
+        # Let the model try the raw upload rather than failing outright
+        print(f"Image preprocessing skipped: {e}")
+        mime_type = sniff_mime_type(image_bytes, state.get("image_mime_type"))
+        return {"model_image_bytes": image_bytes, "model_mime_type": mime_type, "exif_orientation": 1}
+    print(f"---IMAGE {original_size}: {len(image_bytes)} -> {len(model_bytes)} bytes as {mime_type}---")
+    return {
+        "model_image_bytes": model_bytes,
+        "model_mime_type": mime_type,
+        "exif_orientation": orientation,
+        "original_size": original_size,
+    }
+
 def call_gemini_vision(state: AgentState):
     """
     Calls the Gemini model to analyze the image. It now asks for the item name and type.
     """
     print("---CALLING GEMINI VISION API---")
-    image_bytes = state.get("image_bytes")
+    if state.get("error_message"):
+        return {}
+    image_bytes = state.get("model_image_bytes") or state.get("image_bytes")
     if not image_bytes:
         return {"error_message": "No image found in state."}
 
-    image_parts = [{"mime_type": "image/jpeg", "data": image_bytes}]
+    image_parts = [{"mime_type": state.get("model_mime_type") or "image/jpeg", "data": image_bytes}]
 
     
     prompt_text = """
@@ -64,10 +155,10 @@ def call_gemini_vision(state: AgentState):
     Analyze the image and provide only the JSON object.
     """
     
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    model = gemini.get().GenerativeModel('gemini-2.5-flash')
     
     try:
-        response = model.generate_content([prompt_text, *image_parts])
+        response = call_llm('gemini-2.5-flash', "analyze", model.generate_content, [prompt_text, *image_parts])
         # A more robust way to extract JSON from the response
         json_str = response.text.strip().lstrip("```json").rstrip("```").strip()
         model_output = json.loads(json_str)
@@ -78,24 +169,55 @@ def call_gemini_vision(state: AgentState):
         return {"error_message": f"Failed to get a valid response from AI model: {e}"}
 
 def process_image_data(state: AgentState):
-    """Placeholder node."""
+    """Maps the model's bbox from the upright, resized image back to the original upload."""
     print("---DATA PROCESSING NODE---")
-    return {}
+    model_response = state.get("model_response")
+    orientation = state.get("exif_orientation", 1)
+    if not model_response or orientation == 1:
+        return {}
+    bbox = map_bbox_to_original(model_response.get("bbox"), orientation)
+    return {"model_response": {**model_response, "bbox": bbox}}
 
 # --- Build the LangGraph ---
-workflow = StateGraph(AgentState)
-workflow.add_node("call_gemini", call_gemini_vision)
-workflow.add_node("process_image", process_image_data)
-workflow.set_entry_point("call_gemini")
-workflow.add_edge("call_gemini", "process_image")
-workflow.add_edge("process_image", END)
-agent = workflow.compile()
+def build_agent():
+    from langgraph.graph import StateGraph, END
+
+    workflow = StateGraph(AgentState)
+    workflow.add_node("preprocess_image", traced_node("image_detection", "preprocess_image", preprocess_image))
+    workflow.add_node("call_gemini", traced_node("image_detection", "call_gemini", call_gemini_vision))
+    workflow.add_node("process_image", traced_node("image_detection", "process_image", process_image_data))
+    workflow.set_entry_point("preprocess_image")
+    workflow.add_edge("preprocess_image", "call_gemini")
+    workflow.add_edge("call_gemini", "process_image")
+    workflow.add_edge("process_image", END)
+    return workflow.compile()
+
+agent = LazyResource("graph", build_agent, startup)
+install_health_endpoints(app, [gemini, agent], startup)
 
 # --- Flask API Endpoint ---
 @app.route("/")
 def root():
     return app.send_static_file('index.html')
 
+def format_analysis(filename, model_response):
+    """Shapes a model analysis into the /analyze response record."""
+    return {
+        "image_filename": filename,
+        "type": model_response.get("type", "Uncategorized"),
+        "item": model_response.get("item", "Unknown item"),
+        "description": model_response.get("description", "No description provided."),
+        "bbox": model_response.get("bbox", "none"),
+        "priority": model_response.get("priority", "Unknown")
+    }
+
+def safe_dhash(image_bytes):
+    try:
+        return dhash(image_bytes)
+    except Exception as e:
+        print(f"Perceptual hash unavailable: {e}")
+        return None
+
 @app.route("/analyze", methods=["POST"])
 def analyze_image_endpoint():
     """
@@ -111,24 +233,105 @@ def analyze_image_endpoint():
     image_file = request.files["image"]
     original_filename = image_file.filename
     image_bytes = image_file.read()
-    
-    inputs = {"image_bytes": image_bytes}
-    final_state = agent.invoke(inputs)
 
-    if final_state.get("error_message"):
-        return jsonify({"error": final_state["error_message"]}), 500
-        
-    model_response = final_state.get("model_response", {})
+    image_hash = safe_dhash(image_bytes)
+    cached = analysis_cache.get(image_hash) if image_hash is not None else None
+    if cached is not None:
+        distance, model_response = cached
+        print(f"---CACHE HIT: near-duplicate image (distance {distance})---")
+    else:
+        inputs = {"image_bytes": image_bytes, "image_mime_type": image_file.mimetype}
+        final_state = agent.get().invoke(inputs)
 
-    
-    return jsonify({
-        "image_filename": original_filename,
-        "type": model_response.get("type", "Uncategorized"),
-        "item": model_response.get("item", "Unknown item"),
-        "description": model_response.get("description", "No description provided."),
-        "bbox": model_response.get("bbox", "none"),
-        "priority": model_response.get("priority", "Unknown")
-    })
+        if final_state.get("error_message"):
+            return jsonify({"error": final_state["error_message"]}), 500
+
+        model_response = final_state.get("model_response", {})
+        if image_hash is not None and model_response:
+            analysis_cache.put(image_hash, model_response)
+
+    return jsonify(format_analysis(original_filename, model_response))
+
+@app.route("/analyze_batch", methods=["POST"])
+def analyze_batch_endpoint():
+    """
+    Receives several 'images' and analyzes them in as few Gemini calls as
+    the per-call image/byte limits allow. Each call returns a JSON array that
+    is validated and split back into per-image records; images whose entry is
+    missing or malformed are retried through the single-image agent.
+    """
+    if 'GOOGLE_API_KEY' not in os.environ or not os.environ["GOOGLE_API_KEY"]:
+        return jsonify({"error": "Server configuration error: GOOGLE_API_KEY not set."}), 500
+
+    image_files = request.files.getlist("images")
+    if not image_files:
+        return jsonify({"error": "No image files provided"}), 400
+
+    uploads = [(f.filename, f.read(), f.mimetype) for f in image_files]
+    responses = {}  # upload index -> model response or error string
+    hashes = {}
+    pending = []  # (upload index, model bytes, mime type)
+    orientations = {}
+
+    for index, (_, image_bytes, mime_type) in enumerate(uploads):
+        hashes[index] = safe_dhash(image_bytes)
+        cached = analysis_cache.get(hashes[index]) if hashes[index] is not None else None
+        if cached is not None:
+            responses[index] = cached[1]
+            continue
+        prepared = preprocess_image({"image_bytes": image_bytes, "image_mime_type": mime_type})
+        if prepared.get("error_message"):
+            responses[index] = prepared["error_message"]
+            continue
+        orientations[index] = prepared.get("exif_orientation", 1)
+        pending.append((index, prepared["model_image_bytes"], prepared["model_mime_type"]))
+
+    model = gemini.get().GenerativeModel('gemini-2.5-flash')
+    model_calls = 0
+    prompt_bytes = len(BATCH_PROMPT_TEMPLATE.encode("utf-8"))
+    for batch in pack_batches(pending, BATCH_MAX_IMAGES_PER_CALL, BATCH_MAX_BYTES_PER_CALL, prompt_bytes):
+        prompt_text = BATCH_PROMPT_TEMPLATE.format(count=len(batch))
+        try:
+            model_calls += 1
+            response = call_llm('gemini-2.5-flash', "analyze_batch", model.generate_content,
+                                build_batch_contents(prompt_text, batch))
+            analyses = split_batch_response(response.text, len(batch))
+        except Exception as e:
+            print(f"Error during batched Gemini API call: {e}")
+            analyses = {}
+        print(f"---BATCH OF {len(batch)}: {len(analyses)} valid analyses---")
+
+        for position, (index, _, _) in enumerate(batch, start=1):
+            analysis = analyses.get(position)
+            if analysis is None:
+                # Fall back to the single-image graph for this one image
+                model_calls += 1
+                _, image_bytes, mime_type = uploads[index]
+                final_state = agent.get().invoke({"image_bytes": image_bytes, "image_mime_type": mime_type})
+                responses[index] = final_state.get("error_message") or final_state.get("model_response", {})
+                continue
+            bbox = map_bbox_to_original(analysis["bbox"], orientations[index])
+            responses[index] = {**analysis, "bbox": bbox}
+
+    results = []
+    for index, (filename, _, _) in enumerate(uploads):
+        model_response = responses[index]
+        if isinstance(model_response, str):
+            results.append({"image_filename": filename, "error": model_response})
+            continue
+        if hashes[index] is not None and model_response and index in orientations:
+            analysis_cache.put(hashes[index], model_response)
+        results.append(format_analysis(filename, model_response))
+
+    return jsonify({"results": results, "model_calls": model_calls})
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats_endpoint():
+    return jsonify(analysis_cache.stats())
+
+# Heavy SDK imports and graph compilation happen while the server starts accepting connections
+warm_up(gemini, agent)
+startup.mark("module_loaded")
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 9000))
@@ -0,0 +1,109 @@
+import io
+from PIL import Image, ImageOps
+
+EXIF_ORIENTATION_TAG = 0x0112
+MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+# ISO-BMFF brands (bytes 8-12 after "ftyp") of the HEIC/HEIF photos phones upload
+HEIF_BRANDS = {b"heic": "image/heic", b"heix": "image/heic", b"hevc": "image/heic", b"hevx": "image/heic",
+               b"mif1": "image/heif", b"msf1": "image/heif", b"heim": "image/heif", b"heis": "image/heif"}
+
+
+def prepare_for_model(image_bytes: bytes, max_edge: int = 1024, output_format: str = "JPEG", quality: int = 85):
+    """
+    Sniffs the real format, applies EXIF orientation, downsizes so the longest
+    edge is at most max_edge and re-encodes as JPEG/WebP.
+
+    Returns (model_bytes, mime_type, orientation, original_size). Small,
+    upright JPEG/WebP uploads are passed through untouched.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    source_format = image.format
+    original_size = image.size
+    orientation = image.getexif().get(EXIF_ORIENTATION_TAG, 1)
+
+    if (
+        source_format in ("JPEG", "WEBP")
+        and orientation == 1
+        and max(original_size) <= max_edge
+    ):
+        return image_bytes, MIME_TYPES[source_format], orientation, original_size
+
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    if image.mode not in ("RGB", "L"):
+        # Flatten transparency onto white; JPEG has no alpha channel
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+
+    output = io.BytesIO()
+    output_format = output_format.upper()
+    image.save(output, format=output_format, quality=quality, optimize=True)
+    encoded = output.getvalue()
+
+    # Re-encoding can lose to an already compact upload; keep the smaller one
+    if len(encoded) >= len(image_bytes) and orientation == 1 and max(original_size) <= max_edge \
+            and source_format in MIME_TYPES:
+        return image_bytes, MIME_TYPES[source_format], orientation, original_size
+    return encoded, MIME_TYPES[output_format], orientation, original_size
+
+
+def sniff_mime_type(image_bytes: bytes, declared: str = None) -> str:
+    """
+    MIME type of an upload PIL could not decode, from its magic bytes; falls
+    back to the declared content type, then to JPEG.
+    """
+    header = image_bytes[:16]
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if header[4:8] == b"ftyp" and header[8:12] in HEIF_BRANDS:
+        return HEIF_BRANDS[header[8:12]]
+    if declared and declared.startswith("image/"):
+        return declared
+    return "image/jpeg"
+
+
+def _to_original(x: float, y: float, orientation: int):
+    """Inverts an EXIF orientation for a normalised point in the upright image."""
+    if orientation == 2:
+        return 1 - x, y
+    if orientation == 3:
+        return 1 - x, 1 - y
+    if orientation == 4:
+        return x, 1 - y
+    if orientation == 5:
+        return y, x
+    if orientation == 6:
+        return y, 1 - x
+    if orientation == 7:
+        return 1 - y, 1 - x
+    if orientation == 8:
+        return 1 - y, x
+    return x, y
+
+
+def map_bbox_to_original(bbox, orientation: int):
+    """
+    Maps a model bbox (fractions of the upright, resized image) back to
+    fractions of the original upload. Resizing keeps fractions unchanged, so
+    only the EXIF rotation/flip has to be undone.
+    """
+    if not isinstance(bbox, dict) or orientation in (None, 1):
+        return bbox
+    try:
+        corners = [
+            _to_original(float(bbox["x_min"]), float(bbox["y_min"]), orientation),
+            _to_original(float(bbox["x_max"]), float(bbox["y_max"]), orientation),
+        ]
+    except (KeyError, TypeError, ValueError):
+        return bbox
+    xs = [x for x, _ in corners]
+    ys = [y for _, y in corners]
+    return {"x_min": min(xs), "y_min": min(ys), "x_max": max(xs), "y_max": max(ys)}
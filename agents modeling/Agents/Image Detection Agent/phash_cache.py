@@ -0,0 +1,107 @@
+import io
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageOps
+
+HASH_BITS = 64
+
+
+def dhash(image_bytes: bytes) -> int:
+    """
+    64-bit difference hash: each bit says whether a pixel is brighter than its
+    right-hand neighbour in a 9x8 grayscale thumbnail of the upright image.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("L", (64, 64))  # lets JPEG decode at reduced scale
+    image = ImageOps.exif_transpose(image).convert("L").resize((9, 8), Image.LANCZOS)
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+class PerceptualHashCache:
+    """
+    LRU cache of analysis results keyed by perceptual hash, matching any
+    stored hash within max_distance bits (Hamming distance).
+
+    Lookups use multi-index hashing: the hash is cut into max_distance + 1
+    bands, and by the pigeonhole principle any near-duplicate agrees exactly
+    on at least one band, so only hashes sharing a band are compared.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_distance: int = 6):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        band_count = max_distance + 1
+        widths = [HASH_BITS // band_count + (1 if i < HASH_BITS % band_count else 0) for i in range(band_count)]
+        self._bands = []  # (shift, mask)
+        shift = 0
+        for width in widths:
+            self._bands.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables = [{} for _ in self._bands]  # band value -> set of hashes
+        self._entries = OrderedDict()  # hash -> result
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _band_values(self, value: int):
+        return [(value >> shift) & mask for shift, mask in self._bands]
+
+    def get(self, value: int):
+        """Returns (distance, result) for the nearest stored hash, or None."""
+        with self._lock:
+            candidates = set()
+            for table, band in zip(self._tables, self._band_values(value)):
+                candidates.update(table.get(band, ()))
+
+            best = None
+            for candidate in candidates:
+                distance = (candidate ^ value).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, candidate)
+
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best[1])
+            return best[0], self._entries[best[1]]
+
+    def put(self, value: int, result):
+        with self._lock:
+            if value not in self._entries:
+                for table, band in zip(self._tables, self._band_values(value)):
+                    table.setdefault(band, set()).add(value)
+            self._entries[value] = result
+            self._entries.move_to_end(value)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._remove_from_tables(evicted)
+                self.evictions += 1
+
+    def _remove_from_tables(self, value: int):
+        for table, band in zip(self._tables, self._band_values(value)):
+            bucket = table.get(band)
+            if bucket is not None:
+                bucket.discard(value)
+                if not bucket:
+                    del table[band]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,105 @@
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+
+class EmbeddingCache:
+    """
+    SQLite file mapping a report hash (the ticket_id) to its embedding and to
+    whether it has reached the vector store.
+
+    Duplicate submissions are answered from here without re-embedding, and a
+    batch that failed after embedding only re-runs the upsert on retry.
+    Embeddings are stored as packed float32 blobs.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.duplicate_submissions = 0
+        self.new_submissions = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " report_hash TEXT PRIMARY KEY, embedding BLOB NOT NULL,"
+                " upserted INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def is_indexed(self, report_hash: str, record: bool = True) -> bool:
+        """
+        True if this exact report is already in the vector store. record=False
+        checks without counting it as a submission.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM embeddings WHERE report_hash = ? AND upserted = 1", (report_hash,)
+            ).fetchone()
+        if record:
+            self._count("duplicate_submissions" if row else "new_submissions")
+        return row is not None
+
+    def get_many(self, report_hashes: list) -> dict:
+        """Returns {report_hash: embedding} for the hashes that are cached."""
+        if not report_hashes:
+            return {}
+        placeholders = ",".join("?" * len(report_hashes))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT report_hash, embedding FROM embeddings WHERE report_hash IN ({placeholders})",
+                list(report_hashes),
+            ).fetchall()
+        found = {report_hash: array("f", blob).tolist() for report_hash, blob in rows}
+        self._count("hits", len(found))
+        self._count("misses", len(set(report_hashes)) - len(found))
+        return found
+
+    def put_many(self, embeddings: dict):
+        """Stores {report_hash: embedding} without touching the upserted flag."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO embeddings (report_hash, embedding, created_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(report_hash) DO UPDATE SET embedding = excluded.embedding",
+                [(report_hash, array("f", values).tobytes(), now) for report_hash, values in embeddings.items()],
+            )
+
+    def mark_indexed(self, report_hashes: list):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE embeddings SET upserted = 1 WHERE report_hash = ?",
+                [(report_hash,) for report_hash in report_hashes],
+            )
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            entries, indexed = conn.execute("SELECT COUNT(*), COALESCE(SUM(upserted), 0) FROM embeddings").fetchone()
+        lookups = self.hits + self.misses
+        submissions = self.duplicate_submissions + self.new_submissions
+        return {
+            "entries": entries,
+            "indexed": indexed,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "duplicate_submissions": self.duplicate_submissions,
+            "new_submissions": self.new_submissions,
+            "duplicate_rate": self.duplicate_submissions / submissions if submissions else 0.0,
+        }
@@ -1,30 +1,82 @@
 import os
+import sys
 import json
 import hashlib
 from flask import Flask, request, jsonify
 from dotenv import load_dotenv
-from pinecone import Pinecone
-from google import genai
-from google.genai.types import EmbedContentConfig
+from write_behind import WriteBehindQueue
+from embedding_cache import EmbeddingCache
+from vector_store import create_vector_store, report_fields, report_metadata
 
+# Modules shared by all agents live in "agents modeling/shared"
+sys.path.append(os.environ.get(
+    "AGENTS_SHARED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared")
+))
+from instrumentation import call_dependency, call_llm, install_flask
+from startup import LazyResource, StartupProfile, install_health_endpoints, warm_up
+
+startup = StartupProfile("submission")
 
 # --- Initialization ---
 load_dotenv()
 app = Flask(__name__)
+install_flask(app, "submission")
 
 # --- Client Configuration ---
 GEMINI_API_KEY = os.environ.get("GOOGLE_API_KEY")
-PINECONE_API_KEY = "" # removed for privacy
-if not GEMINI_API_KEY or not PINECONE_API_KEY:
-    raise ValueError("GEMINI_API_KEY and PINECONE_API_KEY must be set in the environment.")
+PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY", "") # removed for privacy
+# "pinecone" (hosted) or "local" (memory-mapped index on disk, no Pinecone needed)
+VECTOR_STORE = os.environ.get("VECTOR_STORE", "pinecone").lower()
+
+def configuration_error():
+    """Why the clients cannot be built, or None. Checked per request instead of at import."""
+    if not GEMINI_API_KEY or (VECTOR_STORE != "local" and not PINECONE_API_KEY):
+        return "GEMINI_API_KEY and PINECONE_API_KEY must be set in the environment."
+    return None
+
+EMBEDDING_MODEL = "gemini-embedding-exp-03-07"
+EMBEDDING_DIMENSIONS = 1536
+PINECONE_NAMESPACE = "example-ig"  # Using the namespace from your code
+
+# /similar_reports: neighbours returned (default and maximum ?top_k=) and the score above which one is flagged
+SIMILAR_TOP_K = int(os.environ.get("SIMILAR_TOP_K", 5))
+SIMILAR_MAX_TOP_K = int(os.environ.get("SIMILAR_MAX_TOP_K", 100))
+SIMILAR_DUPLICATE_SCORE = float(os.environ.get("SIMILAR_DUPLICATE_SCORE", 0.92))
+
+# Initialize clients lazily: the SDK imports are slow and not needed to accept a submission
+def load_genai_client():
+    if configuration_error():
+        raise ValueError(configuration_error())
+    from google import genai
+    return genai.Client(api_key=GEMINI_API_KEY)
+
+def connect_pinecone_index():
+    from pinecone import Pinecone
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    # Connect to your Pinecone index
+    return pc.Index(host="https://hackathon.svc.aped.pinecone.io") # removed detailed host url for privacy)
 
-# Initialize clients
-pc = Pinecone(api_key=PINECONE_API_KEY)
-client = genai.Client(api_key=GEMINI_API_KEY)
+def load_vector_store():
+    if configuration_error():
+        raise ValueError(configuration_error())
+    store = create_vector_store(EMBEDDING_DIMENSIONS, connect_pinecone_index, PINECONE_NAMESPACE)
+    print("--- Clients Initialized Successfully ---")
+    return store
 
-# Connect to your Pinecone index
-index = pc.Index(host="https://hackathon.svc.aped.pinecone.io") # removed detailed host url for privacy)
-print("--- Clients Initialized Successfully ---")
+client = LazyResource("genai_client", load_genai_client, startup)
+vector_store = LazyResource("vector_store", load_vector_store, startup)
+install_health_endpoints(app, [client, vector_store], startup)
+
+# Write-behind: reports are journaled and embedded/upserted in batches
+WRITE_BEHIND_JOURNAL = os.environ.get("WRITE_BEHIND_JOURNAL", "submission_journal.db")
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get("WRITE_BEHIND_BATCH_SIZE", 64))
+WRITE_BEHIND_FLUSH_SECONDS = float(os.environ.get("WRITE_BEHIND_FLUSH_SECONDS", 1.0))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get("WRITE_BEHIND_MAX_ATTEMPTS", 8))
+# A batch is embedded with one embed_content call, which accepts at most this many texts
+EMBEDDING_MAX_BATCH = 100
+
+# Embeddings keyed by report hash, so identical reports are embedded and upserted once
+embedding_cache = EmbeddingCache(os.environ.get("EMBEDDING_CACHE_PATH", "embedding_cache.db"))
 
 
 # --- Helper Functions ---
@@ -44,24 +96,86 @@ def process_data_into_form(input_data: dict) -> dict:
 
 
 def submit_to_vector_db(form_data: dict):
-    """Embeds the structured form data and upserts it into Pinecone."""
-    text_to_embed = json.dumps(form_data)
-    vector_id = generate_json_id(form_data)
-    result = client.models.embed_content(
-        model = "gemini-embedding-exp-03-07",
-        contents = text_to_embed,
-        config=EmbedContentConfig(
-        output_dimensionality=1536,
+    """Embeds the structured form data and upserts it into the vector store."""
+    upsert_batch([(generate_json_id(form_data), form_data)])
+
+
+def embed_reports(items: list) -> dict:
+    """
+    Returns {vector_id: embedding} for (vector_id, form_data) pairs, embedding
+    the ones not already cached with a single embedding call.
+    """
+    embeddings = embedding_cache.get_many([vector_id for vector_id, _ in items])
+    missing = [(vector_id, form_data) for vector_id, form_data in items if vector_id not in embeddings]
+    if missing:
+        from google.genai.types import EmbedContentConfig
+        result = call_llm(
+            EMBEDDING_MODEL, "embed", client.get().models.embed_content,
+            model = EMBEDDING_MODEL,
+            contents = [json.dumps(report_fields(form_data)) for _, form_data in missing],
+            config=EmbedContentConfig(
+            output_dimensionality=EMBEDDING_DIMENSIONS,
+            )
         )
-    )
-    index.upsert(
-        vectors=[{
-            "id": vector_id,
-            "values": result.embeddings[0].values
-        }],
-        namespace="example-ig"  # Using the namespace from your code
-    )
-    print(f"--- Successfully upserted vector with ID: {vector_id} ---")
+        if len(result.embeddings) != len(missing):
+            raise ValueError(f"Expected {len(missing)} embeddings, got {len(result.embeddings)}")
+        new_embeddings = {vector_id: embedding.values for (vector_id, _), embedding in zip(missing, result.embeddings)}
+        embedding_cache.put_many(new_embeddings)
+        embeddings.update(new_embeddings)
+    return embeddings
+
+
+def upsert_batch(items: list):
+    """
+    Embeds a batch of (vector_id, form_data) pairs and upserts them into the
+    vector store with one upsert. Embeddings already in the cache (e.g. from
+    a batch whose upsert failed) are not requested again.
+    """
+    embeddings = embed_reports(items)
+    call_dependency(VECTOR_STORE, "upsert", vector_store.get().upsert, [
+        (vector_id, embeddings[vector_id], report_metadata(form_data))
+        for vector_id, form_data in items
+    ])
+    embedding_cache.mark_indexed([vector_id for vector_id, _ in items])
+    print(f"--- Successfully upserted {len(items)} vectors ---")
+
+
+def find_similar_reports(report: dict, top_k: int) -> list:
+    """
+    Nearest indexed reports to this one. A neighbour is flagged as a possible
+    duplicate when it scores above SIMILAR_DUPLICATE_SCORE and does not name a
+    different aircraft.
+    """
+    ticket_id = generate_json_id(report)
+    embedding = embed_reports([(ticket_id, report)])[ticket_id]
+    similar = []
+    for vector_id, score, metadata in call_dependency(VECTOR_STORE, "query", vector_store.get().query, embedding, top_k + 1):
+        if vector_id == ticket_id:
+            continue  # the identical report is reported separately
+        aircraft = report_metadata(report).get("aircraft_id")
+        other_aircraft = metadata.get("aircraft_id")
+        same_aircraft = not aircraft or not other_aircraft or str(aircraft) == other_aircraft
+        similar.append({
+            "ticket_id": vector_id,
+            "score": score,
+            "report": metadata,
+            "possible_duplicate": score >= SIMILAR_DUPLICATE_SCORE and same_aircraft,
+        })
+    return similar[:top_k]
+
+
+write_behind = WriteBehindQueue(
+    WRITE_BEHIND_JOURNAL,
+    upsert_batch,
+    batch_size=min(WRITE_BEHIND_BATCH_SIZE, EMBEDDING_MAX_BATCH),
+    flush_seconds=WRITE_BEHIND_FLUSH_SECONDS,
+    max_attempts=WRITE_BEHIND_MAX_ATTEMPTS,
+)
+# `python submissionAgent.py` runs with the debug reloader, which executes this module in a
+# watcher process and again in the child that serves requests; only the latter flushes
+SERVING_PROCESS = __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+if SERVING_PROCESS:
+    write_behind.start()
 
 
 # --- Flask API Endpoint ---
@@ -72,19 +186,28 @@ def submit_report_endpoint():
     API endpoint to process raw data into a structured form,
     embed it, and store it in a vector database.
     """
-    if not index:
-        return jsonify({"error": "Server is not configured properly. Pinecone index not available."}), 503
+    if configuration_error():
+        return jsonify({"error": f"Server is not configured properly: {configuration_error()}"}), 503
 
     try:
         input_data = request.get_json()
         if not input_data:
             return jsonify({"error": "Request body must be non-empty JSON."}), 400
         report = process_data_into_form(input_data)
-        submit_to_vector_db(report)
         ticket_id = generate_json_id(report)
+        # Identical reports hash to the same ticket: return it instead of re-indexing
+        if embedding_cache.is_indexed(ticket_id):
+            indexing = "indexed"
+        # Durably journaled here; embedding and upsert happen in the background
+        elif write_behind.enqueue(ticket_id, report):
+            indexing = "queued"
+        else:
+            indexing = "pending"
         return jsonify({
             "status": "success",
             "ticket_id": ticket_id,
+            "duplicate": indexing != "queued",
+            "indexing": indexing,
             "submitted_report": report
         }), 200
 
@@ -95,6 +218,65 @@ def submit_report_endpoint():
         # Handle unexpected errors during processing
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+@app.route("/similar_reports", methods=["POST"])
+def similar_reports_endpoint():
+    """
+    Returns the nearest past reports for a new form so likely duplicates can
+    be flagged before it is filed. Accepts an optional ?top_k= (1 to SIMILAR_MAX_TOP_K).
+    """
+    try:
+        input_data = request.get_json()
+        if not input_data:
+            return jsonify({"error": "Request body must be non-empty JSON."}), 400
+        try:
+            top_k = int(request.args.get("top_k", SIMILAR_TOP_K))
+        except ValueError:
+            top_k = 0
+        if not 1 <= top_k <= SIMILAR_MAX_TOP_K:
+            return jsonify({"error": f"top_k must be an integer between 1 and {SIMILAR_MAX_TOP_K}."}), 400
+        report = process_data_into_form(input_data)
+        ticket_id = generate_json_id(report)
+        similar = find_similar_reports(report, top_k)
+        return jsonify({
+            "ticket_id": ticket_id,
+            "already_filed": embedding_cache.is_indexed(ticket_id, record=False),
+            "possible_duplicates": sum(1 for match in similar if match["possible_duplicate"]),
+            "similar_reports": similar
+        }), 200
+
+    except ValueError as ve:
+        return jsonify({"error": f"Bad Request or Configuration Error: {str(ve)}"}), 400
+    except Exception as e:
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+@app.route("/vector_store_stats", methods=["GET"])
+def vector_store_stats_endpoint():
+    """Row and IVF index counters of the local vector store."""
+    if VECTOR_STORE != "local":
+        return jsonify({"error": "Vector store stats are only kept by the local backend (VECTOR_STORE=local)."}), 404
+    if configuration_error():
+        return jsonify({"error": f"Server is not configured properly: {configuration_error()}"}), 503
+    return jsonify(vector_store.get().stats())
+
+@app.route("/queue_stats", methods=["GET"])
+def queue_stats_endpoint():
+    """Reports write-behind journal depth and batch flush counters."""
+    return jsonify(write_behind.stats())
+
+@app.route("/queue_retry_failed", methods=["POST"])
+def queue_retry_failed_endpoint():
+    """Puts reports that exhausted their write-behind attempts back in the queue."""
+    return jsonify({"requeued": write_behind.requeue_failed()})
+
+@app.route("/cache_stats", methods=["GET"])
+def cache_stats_endpoint():
+    """Reports embedding cache hit/miss and duplicate submission counters."""
+    return jsonify(embedding_cache.stats())
+
+if SERVING_PROCESS:
+    warm_up(client, vector_store)
+startup.mark("module_loaded")
+
 # --- Start Flask App ---
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8088))
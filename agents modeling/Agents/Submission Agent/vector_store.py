@@ -0,0 +1,341 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+# Metadata kept next to each vector (the Forms Agent's form fields); Pinecone
+# only accepts flat scalar values
+METADATA_FIELDS = (
+    "form_id", "date", "aircraft_id", "inspection_zone", "issue_type", "issue_description",
+    "severity", "action_taken", "department_contacted", "status",
+)
+# Rows looked up per SQLite query when attaching ids and metadata to results
+DESCRIBE_CHUNK_ROWS = 500
+# Placeholders the Forms Agent leaves in fields it could not fill
+UNKNOWN_VALUES = (None, "", "N/A", "_____")
+
+
+def report_fields(report: dict) -> dict:
+    """
+    The form inside a submission. The Supervisor posts the Forms Agent's reply
+    unchanged, {"generated_form": "<form JSON text>"}; flat forms pass through.
+    """
+    form = report.get("generated_form")
+    if isinstance(form, str):
+        try:
+            form = json.loads(form.strip().removeprefix("```json").removesuffix("```"))
+        except json.JSONDecodeError:
+            return report
+    return form if isinstance(form, dict) else report
+
+
+def report_metadata(report: dict) -> dict:
+    """The searchable summary of a report that is stored with its vector."""
+    fields = report_fields(report)
+    return {key: str(fields[key]) for key in METADATA_FIELDS if fields.get(key) not in UNKNOWN_VALUES}
+
+
+class PineconeVectorStore:
+    """Hosted Pinecone index."""
+
+    def __init__(self, index, namespace: str):
+        self.index = index
+        self.namespace = namespace
+
+    def upsert(self, vectors: list):
+        """vectors: [(vector_id, values, metadata)]"""
+        self.index.upsert(
+            vectors=[{"id": vector_id, "values": values, "metadata": metadata} for vector_id, values, metadata in vectors],
+            namespace=self.namespace,
+        )
+
+    def query(self, values, top_k: int = 5) -> list:
+        """Returns [(vector_id, score, metadata)], best first."""
+        response = self.index.query(
+            vector=list(values), top_k=top_k, namespace=self.namespace, include_metadata=True
+        )
+        return [(match["id"], match["score"], match.get("metadata") or {}) for match in response["matches"]]
+
+    def stats(self) -> dict:
+        return {"backend": "pinecone", "namespace": self.namespace}
+
+
+class LocalVectorStore:
+    """
+    Offline vector store: unit-normalised float32 rows in a memory-mapped
+    file, ids and metadata in SQLite.
+
+    "flat" mode scores every row with blocked matrix-vector products, which is
+    exact. "ivf" mode clusters the rows with k-means, keeps int8 codes per
+    row, scans only the nprobe nearest clusters and re-ranks the best
+    candidates exactly; rows added since the last rebuild are scanned flat.
+    Rebuilds run on a background thread, so queries keep being answered
+    (flat, or from the previous index) while k-means trains.
+    """
+
+    def __init__(self, directory: str, dimensions: int, mode: str = "flat", nlist: int = 256,
+                 nprobe: int = 16, block_rows: int = 65536, ivf_min_vectors: int = 50000,
+                 retrain_fraction: float = 0.2):
+        if mode not in ("flat", "ivf"):
+            raise ValueError(f"Unknown vector store mode: {mode}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.dimensions = dimensions
+        self.mode = mode
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.block_rows = block_rows
+        self.ivf_min_vectors = ivf_min_vectors
+        self.retrain_fraction = retrain_fraction
+        self._matrix_path = os.path.join(directory, "vectors.f32")
+        self._db_path = os.path.join(directory, "vectors.db")
+        self._lock = threading.RLock()
+        self._ivf = None  # (centroids, assignments, codes, scales, rows covered)
+        self._rebuild_thread = None
+        self._dirty_rows = None  # rows overwritten while a rebuild is running
+
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS vectors ("
+                " row INTEGER PRIMARY KEY, vector_id TEXT UNIQUE NOT NULL, metadata TEXT NOT NULL)"
+            )
+            self.count = conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        self._matrix = self._open_matrix(max(self.count, 1024))
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self._db_path, timeout=30)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _open_matrix(self, capacity: int):
+        row_bytes = self.dimensions * 4
+        if os.path.exists(self._matrix_path):
+            capacity = max(capacity, os.path.getsize(self._matrix_path) // row_bytes)
+        with open(self._matrix_path, "ab") as f:
+            f.truncate(capacity * row_bytes)
+        return np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimensions))
+
+    def upsert(self, vectors: list):
+        """vectors: [(vector_id, values, metadata)]; existing ids are overwritten in place."""
+        if not vectors:
+            return
+        values = np.asarray([v for _, v, _ in vectors], dtype=np.float32)
+        if values.shape[1] != self.dimensions:
+            raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {values.shape[1]}")
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values /= np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            rows = []
+            with self._connect() as conn:
+                # Other processes may share the directory; reserve rows under SQLite's write lock
+                conn.execute("BEGIN IMMEDIATE")
+                next_row = conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+                for vector_id, _, metadata in vectors:
+                    existing = conn.execute("SELECT row FROM vectors WHERE vector_id = ?", (vector_id,)).fetchone()
+                    if existing:
+                        row = existing[0]
+                        conn.execute("UPDATE vectors SET metadata = ? WHERE row = ?", (json.dumps(metadata), row))
+                    else:
+                        row = next_row
+                        next_row += 1
+                        conn.execute(
+                            "INSERT INTO vectors (row, vector_id, metadata) VALUES (?, ?, ?)",
+                            (row, vector_id, json.dumps(metadata)),
+                        )
+                    rows.append(row)
+            # Only advanced once the rows are committed, so a rollback leaves no gap
+            self.count = next_row
+
+            if self.count > self._matrix.shape[0]:
+                self._matrix.flush()
+                self._matrix = self._open_matrix(max(self.count, self._matrix.shape[0] * 2))
+            self._matrix[rows] = values
+            self._matrix.flush()
+            if self._ivf is not None:
+                self._update_ivf_rows(rows, values)
+            if self._dirty_rows is not None:
+                self._dirty_rows.update(rows)
+
+    def query(self, values, top_k: int = 5) -> list:
+        """Returns [(vector_id, score, metadata)] by cosine similarity, best first."""
+        query = np.asarray(values, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or self.count == 0:
+            return []
+        query /= norm
+
+        with self._lock:
+            if self.mode == "ivf":
+                self._maybe_rebuild_ivf()
+            if self._ivf is not None:
+                rows, scores = self._search_ivf(query, top_k)
+            else:
+                rows, scores = self._search_flat(query, top_k, 0, self.count)
+        return self._describe(rows, scores)
+
+    def _search_flat(self, query, top_k: int, start: int, end: int):
+        best_rows = np.empty(0, dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        for block_start in range(start, end, self.block_rows):
+            block_end = min(block_start + self.block_rows, end)
+            scores = self._matrix[block_start:block_end] @ query
+            best_rows = np.concatenate([best_rows, np.arange(block_start, block_end)])
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows, best_scores = _top_k(best_rows, best_scores, top_k)
+        return best_rows, best_scores
+
+    def _describe(self, rows, scores) -> list:
+        if len(rows) == 0:
+            return []
+        found = {}
+        with self._connect() as conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(rows), DESCRIBE_CHUNK_ROWS):
+                chunk = [int(r) for r in rows[start:start + DESCRIBE_CHUNK_ROWS]]
+                placeholders = ",".join("?" * len(chunk))
+                for row, vector_id, metadata in conn.execute(
+                    f"SELECT row, vector_id, metadata FROM vectors WHERE row IN ({placeholders})", chunk
+                ):
+                    found[row] = (vector_id, json.loads(metadata))
+        return [
+            (found[int(row)][0], float(score), found[int(row)][1])
+            for row, score in zip(rows, scores)
+            if int(row) in found
+        ]
+
+    # --- IVF mode ---
+
+    def _maybe_rebuild_ivf(self):
+        """Starts a background rebuild once enough rows are not covered by the index."""
+        if self.count < self.ivf_min_vectors or self._rebuild_thread is not None:
+            return
+        covered = self._ivf[4] if self._ivf is not None else 0
+        if self.count - covered > self.retrain_fraction * max(covered, 1):
+            self._rebuild_thread = threading.Thread(target=self._rebuild_in_background, name="ivf-rebuild", daemon=True)
+            self._rebuild_thread.start()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild_ivf()
+        except Exception as e:
+            print(f"--- IVF rebuild failed, searching without it: {e} ---")
+        finally:
+            with self._lock:
+                self._rebuild_thread = None
+
+    def rebuild_ivf(self, iterations: int = 10, sample_size: int = 20000, seed: int = 0):
+        """
+        Trains k-means centroids on a sample and assigns/quantises every row.
+        The lock is only held to snapshot the row count and to swap the new
+        index in, so queries and upserts are not blocked while it trains.
+        """
+        with self._lock:
+            count, matrix = self.count, self._matrix
+            self._dirty_rows = set()
+        try:
+            nlist = min(self.nlist, count)
+            rng = np.random.default_rng(seed)
+            sample = np.asarray(matrix[np.sort(rng.choice(count, min(sample_size, count), replace=False))])
+            centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for cluster in range(nlist):
+                    members = sample[labels == cluster]
+                    if len(members):
+                        centroid = members.mean(axis=0)
+                        centroids[cluster] = centroid / (np.linalg.norm(centroid) or 1)
+
+            assignments = np.empty(count, dtype=np.int32)
+            codes = np.empty((count, self.dimensions), dtype=np.int8)
+            scales = np.empty(count, dtype=np.float32)
+            for start in range(0, count, self.block_rows):
+                block = np.asarray(matrix[start:min(start + self.block_rows, count)])
+                assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+                codes[start:start + len(block)], scales[start:start + len(block)] = _quantize(block)
+
+            with self._lock:
+                self._ivf = (centroids, assignments, codes, scales, count)
+                # Rows overwritten in place during the rebuild may have been read before the write
+                dirty = sorted(row for row in self._dirty_rows if row < count)
+                if dirty:
+                    self._update_ivf_rows(dirty, np.asarray(self._matrix[dirty]))
+        finally:
+            with self._lock:
+                self._dirty_rows = None
+        print(f"--- Rebuilt IVF index: {count} vectors in {nlist} lists ---")
+
+    def _update_ivf_rows(self, rows, values):
+        centroids, assignments, codes, scales, covered = self._ivf
+        for row, value in zip(rows, values):
+            if row < covered:
+                assignments[row] = int(np.argmax(centroids @ value))
+                row_codes, row_scales = _quantize(value[None, :])
+                codes[row], scales[row] = row_codes[0], row_scales[0]
+
+    def _search_ivf(self, query, top_k: int, rerank_factor: int = 8):
+        centroids, assignments, codes, scales, covered = self._ivf
+        probes = np.argsort(centroids @ query)[::-1][:self.nprobe]
+        candidates = np.flatnonzero(np.isin(assignments, probes))
+
+        approx = (codes[candidates].astype(np.float32) @ query) * scales[candidates]
+        shortlist, _ = _top_k(candidates, approx, top_k * rerank_factor)
+        shortlist = np.sort(shortlist)
+        exact = np.asarray(self._matrix[shortlist]) @ query
+        rows, scores = _top_k(shortlist, exact, top_k)
+
+        if covered < self.count:
+            tail_rows, tail_scores = self._search_flat(query, top_k, covered, self.count)
+            rows, scores = _top_k(np.concatenate([rows, tail_rows]), np.concatenate([scores, tail_scores]), top_k)
+        return rows, scores
+
+    def stats(self) -> dict:
+        return {
+            "backend": "local",
+            "mode": self.mode,
+            "vectors": self.count,
+            "dimensions": self.dimensions,
+            "ivf_rows": self._ivf[4] if self._ivf is not None else 0,
+            "ivf_lists": len(self._ivf[0]) if self._ivf is not None else 0,
+            "ivf_rebuilding": self._rebuild_thread is not None,
+        }
+
+
+def _top_k(rows, scores, k: int):
+    """The k highest-scoring (rows, scores), sorted best first."""
+    if k <= 0:
+        return rows[:0], scores[:0]
+    if len(scores) > k:
+        keep = np.argpartition(scores, -k)[-k:]
+        rows, scores = rows[keep], scores[keep]
+    order = np.argsort(scores)[::-1]
+    return rows[order], scores[order]
+
+
+def _quantize(block):
+    """Symmetric per-row int8 quantisation; returns (codes, scales)."""
+    scales = np.abs(block).max(axis=1) / 127
+    scales = np.where(scales == 0, 1, scales).astype(np.float32)
+    return np.round(block / scales[:, None]).astype(np.int8), scales
+
+
+def create_vector_store(dimensions: int, pinecone_index_factory, namespace: str):
+    """Picks the backend from VECTOR_STORE ("pinecone" or "local")."""
+    if os.environ.get("VECTOR_STORE", "pinecone").lower() == "local":
+        return LocalVectorStore(
+            os.environ.get("LOCAL_VECTOR_DIR", "vector_store"),
+            dimensions,
+            mode=os.environ.get("LOCAL_VECTOR_MODE", "flat").lower(),
+            nlist=int(os.environ.get("LOCAL_VECTOR_NLIST", 256)),
+            nprobe=int(os.environ.get("LOCAL_VECTOR_NPROBE", 16)),
+            ivf_min_vectors=int(os.environ.get("LOCAL_VECTOR_IVF_MIN", 50000)),
+        )
+    return PineconeVectorStore(pinecone_index_factory(), namespace)
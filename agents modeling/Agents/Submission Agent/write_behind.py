@@ -0,0 +1,228 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class WriteBehindQueue:
+    """
+    Durable queue that accepts reports immediately and hands them to flush()
+    in batches from a background thread.
+
+    Every report is journaled to a SQLite file before enqueue() returns and is
+    only removed once flush() succeeds, so pending reports survive a restart
+    and are picked up again by the next worker. A batch is flushed as soon as
+    batch_size reports are pending or the oldest has waited flush_seconds.
+
+    A failing batch is halved on each retry until the report that cannot be
+    flushed is on its own. That report then backs off exponentially while
+    later reports carry on. After max_attempts solo failures it is moved to
+    the `failed` table, from which requeue_failed() puts it back.
+    """
+
+    def __init__(self, journal_path: str, flush, batch_size: int = 64, flush_seconds: float = 1.0,
+                 retry_seconds: float = 5.0, max_retry_seconds: float = 300.0, max_attempts: int = 8):
+        self.journal_path = journal_path
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.max_attempts = max_attempts
+        self._batch_limit = batch_size  # shrinks while isolating a failing report
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._thread = None
+        self.flushed = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.dead_lettered = 0
+        self.last_error = None
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending ("
+                " item_id TEXT PRIMARY KEY, payload TEXT NOT NULL, enqueued_at REAL NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0, next_attempt_at REAL NOT NULL DEFAULT 0, last_error TEXT)"
+            )
+            # Journals written before retries were tracked lack the retry columns
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(pending)")}
+            for column, definition in (("attempts", "INTEGER NOT NULL DEFAULT 0"),
+                                       ("next_attempt_at", "REAL NOT NULL DEFAULT 0"),
+                                       ("last_error", "TEXT")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE pending ADD COLUMN {column} {definition}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS failed ("
+                " item_id TEXT PRIMARY KEY, payload TEXT NOT NULL, enqueued_at REAL NOT NULL,"
+                " attempts INTEGER NOT NULL, error TEXT, failed_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.journal_path, timeout=30)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def start(self):
+        """Starts the flush worker; pending reports from a previous run go first."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, item_id: str, payload: dict) -> bool:
+        """
+        Journals a report. Returns False (and changes nothing) if the id is
+        already pending.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO pending (item_id, payload, enqueued_at) VALUES (?, ?, ?)",
+                (item_id, json.dumps(payload), time.time()),
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return cursor.rowcount == 1
+
+    def requeue_failed(self) -> int:
+        """Moves every dead-lettered report back to pending with a fresh attempt count."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO pending (item_id, payload, enqueued_at)"
+                " SELECT item_id, payload, enqueued_at FROM failed"
+            )
+            count = conn.execute("DELETE FROM failed").rowcount
+        with self._wakeup:
+            self._wakeup.notify()
+        return count
+
+    def pending_count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def _next_batch(self):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT item_id, payload, enqueued_at FROM pending WHERE next_attempt_at <= ?"
+                " ORDER BY enqueued_at LIMIT ?",
+                (time.time(), self._batch_limit),
+            ).fetchall()
+
+    def _seconds_until_retry(self):
+        """Time until the next backed-off report is due, or None if none is waiting."""
+        with self._connect() as conn:
+            next_attempt_at = conn.execute("SELECT MIN(next_attempt_at) FROM pending").fetchone()[0]
+        return None if next_attempt_at is None else max(0.0, next_attempt_at - time.time())
+
+    def _record_failure(self, item_id: str, error: str):
+        """Backs a report off exponentially, or dead-letters it after max_attempts."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE pending SET attempts = attempts + 1, last_error = ? WHERE item_id = ?", (error, item_id)
+            )
+            row = conn.execute("SELECT attempts FROM pending WHERE item_id = ?", (item_id,)).fetchone()
+            if row is None:
+                return  # already flushed or dead-lettered elsewhere
+            attempts = row[0]
+            if attempts < self.max_attempts:
+                delay = min(self.max_retry_seconds, self.retry_seconds * 2 ** (attempts - 1))
+                conn.execute("UPDATE pending SET next_attempt_at = ? WHERE item_id = ?", (now + delay, item_id))
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO failed (item_id, payload, enqueued_at, attempts, error, failed_at)"
+                " SELECT item_id, payload, enqueued_at, attempts, ?, ? FROM pending WHERE item_id = ?",
+                (error, now, item_id),
+            )
+            conn.execute("DELETE FROM pending WHERE item_id = ?", (item_id,))
+        self.dead_lettered += 1
+        print(f"--- Write-behind gave up on report {item_id} after {attempts} attempts: {error} ---")
+
+    def _run(self):
+        while True:
+            try:
+                if not self._run_once():
+                    return
+            except Exception as e:
+                # A journal error must not kill the flusher while requests keep queuing
+                self.last_error = str(e)
+                print(f"--- Write-behind flusher error, retrying: {e} ---")
+                with self._wakeup:
+                    if self._stopping:
+                        return
+                    self._wakeup.wait(self.retry_seconds)
+
+    def _run_once(self) -> bool:
+        """Waits for or flushes one batch; returns False once stopped."""
+        batch = self._next_batch()
+        with self._wakeup:
+            if self._stopping and not batch:
+                return False
+            if not batch:
+                self._wakeup.wait(self._seconds_until_retry())
+                return True
+            if len(batch) < self._batch_limit and not self._stopping:
+                # Give the window a chance to fill before flushing a partial batch
+                wait = batch[0][2] + self.flush_seconds - time.time()
+                if wait > 0:
+                    self._wakeup.wait(wait)
+                    return True
+
+        items = [(item_id, json.loads(payload)) for item_id, payload, _ in batch]
+        try:
+            self.flush(items)
+        except Exception as e:
+            self.failed_batches += 1
+            self.last_error = str(e)
+            if len(items) > 1:
+                # Retry straight away with half the batch to isolate the report that fails
+                self._batch_limit = max(1, len(items) // 2)
+                print(f"--- Write-behind flush of {len(items)} reports failed, retrying {self._batch_limit}: {e} ---")
+                return True
+            self._record_failure(items[0][0], str(e))
+            with self._wakeup:
+                if self._stopping:
+                    return False  # still journaled; the next start retries them
+                self._wakeup.wait(self.retry_seconds)
+            return True
+
+        with self._connect() as conn:
+            ids = [(item_id,) for item_id, _ in items]
+            conn.executemany("DELETE FROM pending WHERE item_id = ?", ids)
+            # A report resubmitted after being dead-lettered has now gone through
+            conn.executemany("DELETE FROM failed WHERE item_id = ?", ids)
+        self.flushed += len(items)
+        self.batches += 1
+        self._batch_limit = min(self.batch_size, self._batch_limit * 2)
+        return True
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            backing_off = conn.execute("SELECT COUNT(*) FROM pending WHERE attempts > 0").fetchone()[0]
+            failed = conn.execute("SELECT COUNT(*) FROM failed").fetchone()[0]
+        return {
+            "pending": self.pending_count(),
+            "backing_off": backing_off,
+            "failed": failed,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "dead_lettered": self.dead_lettered,
+            "avg_batch_size": self.flushed / self.batches if self.batches else 0.0,
+            "last_error": self.last_error,
+            "batch_size": self.batch_size,
+            "current_batch_limit": self._batch_limit,
+            "flush_seconds": self.flush_seconds,
+            "max_attempts": self.max_attempts,
+        }
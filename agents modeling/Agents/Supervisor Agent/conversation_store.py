@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+# Rough Gemini tokenisation: ~4 characters per token for English text
+CHARS_PER_TOKEN = 4
+SUMMARY_LINE_CHARS = 200
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@dataclass
+class Conversation:
+    """A rolling summary of older turns plus the most recent turns verbatim."""
+    summary: str = ""
+    turns: list = field(default_factory=list)
+
+    def append_exchange(self, user_message: str, model_reply: str, max_turns: int, token_budget: int):
+        """
+        Adds a user/model exchange, then folds the oldest turns into the summary
+        until at most max_turns remain and the whole window fits token_budget.
+        """
+        self.turns.append({"role": "user", "content": user_message})
+        self.turns.append({"role": "model", "content": model_reply})
+
+        while len(self.turns) > 2 and (
+            len(self.turns) > max_turns or self.token_count() > token_budget
+        ):
+            oldest = self.turns.pop(0)
+            self._fold_into_summary(oldest)
+
+        # The summary gets at most a quarter of the budget; drop its oldest lines
+        summary_lines = self.summary.splitlines()
+        while summary_lines and estimate_tokens("\n".join(summary_lines)) > token_budget // 4:
+            summary_lines.pop(0)
+        self.summary = "\n".join(summary_lines)
+
+    def _fold_into_summary(self, turn: dict):
+        content = " ".join(turn["content"].split())
+        if len(content) > SUMMARY_LINE_CHARS:
+            content = content[:SUMMARY_LINE_CHARS].rsplit(" ", 1)[0] + "..."
+        line = f"{turn['role']}: {content}"
+        self.summary = f"{self.summary}\n{line}" if self.summary else line
+
+    def token_count(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(t["content"]) for t in self.turns)
+
+    def to_json(self) -> str:
+        return json.dumps({"summary": self.summary, "turns": self.turns})
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Conversation":
+        data = json.loads(raw)
+        return cls(summary=data.get("summary", ""), turns=data.get("turns", []))
+
+
+class MemoryConversationStore:
+    """Per-process store with LRU eviction beyond max_conversations and idle expiry."""
+
+    def __init__(self, max_conversations: int = 10000, idle_seconds: float = 86400):
+        self.max_conversations = max_conversations
+        self.idle_seconds = idle_seconds
+        self._conversations = OrderedDict()  # user_id -> (last_access, Conversation)
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str) -> Conversation:
+        with self._lock:
+            entry = self._conversations.get(user_id)
+            if entry is None or time.time() - entry[0] > self.idle_seconds:
+                self._conversations.pop(user_id, None)
+                return Conversation()
+            self._conversations.move_to_end(user_id)
+            return Conversation(entry[1].summary, list(entry[1].turns))
+
+    def save(self, user_id: str, conversation: Conversation):
+        with self._lock:
+            self._conversations[user_id] = (time.time(), conversation)
+            self._conversations.move_to_end(user_id)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+
+    def __len__(self):
+        return len(self._conversations)
+
+
+class SQLiteConversationStore:
+    """
+    Store backed by a SQLite file, so history survives restarts and is shared
+    by every worker process pointing at the same path.
+    """
+
+    def __init__(self, path: str, max_conversations: int = 10000, idle_seconds: float = 86400):
+        self.path = path
+        self.max_conversations = max_conversations
+        self.idle_seconds = idle_seconds
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                " user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_updated_at ON conversations (updated_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, user_id: str) -> Conversation:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM conversations WHERE user_id = ? AND updated_at >= ?",
+                (user_id, time.time() - self.idle_seconds),
+            ).fetchone()
+        return Conversation.from_json(row[0]) if row else Conversation()
+
+    def save(self, user_id: str, conversation: Conversation):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO conversations (user_id, data, updated_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (user_id, conversation.to_json(), now),
+            )
+            conn.execute("DELETE FROM conversations WHERE updated_at < ?", (now - self.idle_seconds,))
+            conn.execute(
+                "DELETE FROM conversations WHERE user_id IN ("
+                " SELECT user_id FROM conversations ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_conversations,),
+            )
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+def create_conversation_store():
+    """Picks the backend from CONVERSATION_STORE ("memory" or "sqlite")."""
+    max_conversations = int(os.environ.get("CONVERSATION_MAX_USERS", 10000))
+    idle_seconds = float(os.environ.get("CONVERSATION_IDLE_SECONDS", 86400))
+    if os.environ.get("CONVERSATION_STORE", "memory").lower() == "sqlite":
+        path = os.environ.get("CONVERSATION_DB_PATH", "conversations.db")
+        return SQLiteConversationStore(path, max_conversations, idle_seconds)
+    return MemoryConversationStore(max_conversations, idle_seconds)
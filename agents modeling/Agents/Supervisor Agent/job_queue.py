@@ -0,0 +1,244 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when max_pending jobs are already waiting."""
+
+
+class JobQueue:
+    """
+    Durable job queue worked by a pool of background threads.
+
+    submit() journals a job to a SQLite file and returns its ID immediately;
+    `workers` threads claim queued jobs oldest first and call
+    run(payload, attachment, progress). progress(partial) persists partial
+    results so pollers can see them while the job runs.
+
+    A claimed job holds a lease of lease_seconds. If the process dies, the
+    lease runs out and any worker sharing the file picks the job up again,
+    up to max_attempts starts. Job starts are spread to at most
+    max_starts_per_second per process (0 = unlimited), independently of how
+    fast requests arrive.
+    """
+
+    def __init__(self, path: str, run, workers: int = 4, max_pending: int = 1000,
+                 max_starts_per_second: float = 0, lease_seconds: float = 300, max_attempts: int = 3,
+                 retention_seconds: float = 86400, poll_seconds: float = 1.0):
+        self.path = path
+        self.run = run
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_starts_per_second = max_starts_per_second
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_seconds
+        self.poll_seconds = poll_seconds
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._next_start = 0.0
+        self._stats_lock = threading.Lock()
+        self.started = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.running = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY, status TEXT NOT NULL, payload TEXT NOT NULL, attachment BLOB,"
+                " result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL,"
+                " created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_status_created ON jobs (status, created_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def start(self):
+        """Starts the worker pool; jobs left queued or abandoned by a previous run are resumed."""
+        if not self._threads:
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        """Stops claiming new jobs and waits for running ones to finish."""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def submit(self, payload: dict, attachment: bytes = None) -> str:
+        with self._connect() as conn:
+            pending = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if pending >= self.max_pending:
+                raise QueueFullError(f"{pending} jobs are already queued")
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, payload, attachment, created_at) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(payload), attachment, time.time()),
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def get(self, job_id: str):
+        """Status, timings and (partial) result of a job, or None if unknown or expired."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status, result, error, attempts, created_at, started_at, finished_at"
+                " FROM jobs WHERE job_id = ?", (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            status, result, error, attempts, created_at, started_at, finished_at = row
+            job = {
+                "job_id": job_id,
+                "status": status,
+                "result": json.loads(result) if result else None,
+                "attempts": attempts,
+                "created_at": created_at,
+                "started_at": started_at,
+                "finished_at": finished_at,
+            }
+            if error:
+                job["error"] = error
+            if status == "queued":
+                job["queue_position"] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (created_at,)
+                ).fetchone()[0]
+        return job
+
+    def _claim(self):
+        """Atomically takes the oldest queued (or lease-expired) job, across processes."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Abandoned jobs that already used every attempt are failed rather than retried
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Worker lost; retry limit reached',"
+                " finished_at = ?, attachment = NULL"
+                " WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT job_id, payload, attachment FROM jobs"
+                " WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY created_at LIMIT 1", (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?,"
+                " started_at = ? WHERE job_id = ?",
+                (now + self.lease_seconds, now, row[0]),
+            )
+        job_id, payload, attachment = row
+        return job_id, json.loads(payload), attachment
+
+    def _progress(self, job_id: str, partial: dict):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET result = ?, lease_until = ? WHERE job_id = ? AND status = 'running'",
+                (json.dumps(partial), time.time() + self.lease_seconds, job_id),
+            )
+
+    def _finish(self, job_id: str, result, error):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = COALESCE(?, result), error = ?, finished_at = ?,"
+                " attachment = NULL, lease_until = NULL WHERE job_id = ?",
+                ("failed" if error else "succeeded", json.dumps(result) if result is not None else None,
+                 error, now, job_id),
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND finished_at < ?",
+                (now - self.retention_seconds,),
+            )
+
+    def _claim_next(self):
+        """
+        Claims a job once this process may start another, spacing starts
+        1/max_starts_per_second apart across its workers. The slot is only used
+        when a job is claimed, and the lease starts after any wait for it.
+        """
+        if self.max_starts_per_second <= 0:
+            return self._claim()
+        while True:
+            with self._start_lock:
+                wait = self._next_start - time.monotonic()
+                if wait <= 0:
+                    job = self._claim()
+                    if job is not None:
+                        self._next_start = time.monotonic() + 1.0 / self.max_starts_per_second
+                    return job
+            time.sleep(wait)
+
+    def _work(self):
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            try:
+                job = self._claim_next()
+            except sqlite3.Error as e:
+                print(f"---JOB QUEUE: claim failed, retrying: {e}---")
+                job = None
+            if job is None:
+                with self._wakeup:
+                    if not self._stopping:
+                        # Other processes may enqueue into the same file, so poll as well
+                        self._wakeup.wait(self.poll_seconds)
+                continue
+
+            job_id, payload, attachment = job
+            with self._stats_lock:
+                self.started += 1
+                self.running += 1
+            try:
+                result = self.run(payload, attachment, lambda partial: self._progress(job_id, partial))
+                error = (result or {}).get("error")
+            except Exception as e:
+                result, error = None, f"An unexpected error occurred: {str(e)}"
+            self._finish(job_id, result, error)
+            with self._stats_lock:
+                self.running -= 1
+                if error:
+                    self.failed += 1
+                else:
+                    self.succeeded += 1
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "succeeded": counts.get("succeeded", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_queued_seconds": time.time() - oldest if oldest else 0.0,
+            "workers": self.workers,
+            "running_in_process": self.running,
+            "started_in_process": self.started,
+            "succeeded_in_process": self.succeeded,
+            "failed_in_process": self.failed,
+            "max_pending": self.max_pending,
+            "max_starts_per_second": self.max_starts_per_second,
+        }
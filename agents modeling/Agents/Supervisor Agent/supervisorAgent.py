@@ -1,42 +1,82 @@
 import os
-import base64
-import io
+import sys
 import requests
 import json
-from flask import Flask, request, jsonify, Response
-from langgraph.graph import StateGraph, END
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, request, jsonify, Response, stream_with_context
 from typing import TypedDict, Optional, Any
-import google.generativeai as genai
+from conversation_store import create_conversation_store
+from job_queue import JobQueue, QueueFullError
+
+# Modules shared by all agents live in "agents modeling/shared"
+sys.path.append(os.environ.get(
+    "AGENTS_SHARED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "shared")
+))
+from agent_http import AgentHttpClient, Budget, MultipartBody
+from instrumentation import (
+    call_llm, current_request_id, install_flask, set_request_id, traced_node, traced_stream, with_request_id,
+)
+from startup import LazyResource, StartupProfile, install_health_endpoints, warm_up
+
+startup = StartupProfile("supervisor")
 
 app = Flask(__name__)
+install_flask(app, "supervisor")
 
 # --- Configuration ---
 # URLs for your deployed downstream services (removed detailed url address for privacy)
-DETECTION_API_URL = "https://gemini-api.us.run.app/analyze"
-FORMS_API_URL = "https://forms-agent.us.run.app/generate_form"
-SUBMISSION_API_URL = "https://submission-agent.us.run.app/submit_report"
+DETECTION_API_URL = os.environ.get("DETECTION_API_URL", "https://gemini-api.us.run.app/analyze")
+FORMS_API_URL = os.environ.get("FORMS_API_URL", "https://forms-agent.us.run.app/generate_form")
+SUBMISSION_API_URL = os.environ.get("SUBMISSION_API_URL", "https://submission-agent.us.run.app/submit_report")
+
+# End-to-end budget for one pipeline run; each hop's timeout is capped by what is left
+PIPELINE_BUDGET_SECONDS = float(os.environ.get("PIPELINE_BUDGET_SECONDS", 180))
+http_client = AgentHttpClient(timeout=float(os.environ.get("DOWNSTREAM_TIMEOUT_SECONDS", 90)))
+
+def load_genai():
+    """Imports and configures the Gemini SDK (slow to import, so done after startup)."""
+    import google.generativeai as genai
+    genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
+    return genai
+
+gemini = LazyResource("gemini", load_genai, startup)
+
+# Chat history: bounded store plus a per-conversation window of recent turns
+# and a token budget; older turns are folded into a rolling summary.
+conversation_store = create_conversation_store()
+CHAT_MAX_TURNS = int(os.environ.get("CHAT_MAX_TURNS", 12))
+CHAT_TOKEN_BUDGET = int(os.environ.get("CHAT_TOKEN_BUDGET", 2000))
 
-genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
-conversation_history = {}
+# Upper bound on concurrent downstream calls for one /supervisor/batch request
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", 8))
+
+# Job mode (/supervisor/jobs): SQLite-backed queue worked by a background pool.
+# JOB_MAX_STARTS_PER_SECOND=0 starts jobs as fast as workers free up.
+JOB_QUEUE_DB_PATH = os.environ.get("JOB_QUEUE_DB_PATH", "supervisor_jobs.db")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+JOB_MAX_PENDING = int(os.environ.get("JOB_MAX_PENDING", 1000))
+JOB_MAX_STARTS_PER_SECOND = float(os.environ.get("JOB_MAX_STARTS_PER_SECOND", 0))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", 86400))
 
 # --- State Schema for the Supervisor Agent ---
 class SupervisorState(TypedDict):
 
     user_info: dict
-    image_base64: str
+    # Raw upload bytes, carried by reference and released after detection
+    image_bytes: Optional[bytes]
+    image_filename: Optional[str]
+    image_mime_type: Optional[str]
+    # Unix time by which the whole pipeline must finish
+    deadline: Optional[float]
     detection_result: Optional[dict]
     form_response: Optional[dict]
     submission_response: Optional[dict]
     progress_message: Optional[str]
     error: Optional[str]
 
-def generate_chat_response(user_id: str, user_message: str) -> str:
-    """Generates a conversational response using the Gemini model."""
-    
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    history = conversation_history.get(user_id, [])
-    # The core prompt defining the agent's persona and goal
-    system_prompt = """
+# The core prompt defining the agent's persona and goal
+CHAT_SYSTEM_PROMPT = """
     You are a friendly and helpful AI assistant for United Airlines. Your role is to assist users in reporting airline-related problems.
     Engage in a natural conversation to understand their issue.
     Your primary goal is to determine if the user is reporting a physical issue (like damage, a broken seat, a mess, etc.).
@@ -45,30 +85,61 @@ def generate_chat_response(user_id: str, user_message: str) -> str:
     Keep your responses concise and empathetic.
     """
 
-    prompt_with_history = f"{system_prompt}\n\n--- Conversation History ---\n"
-    for entry in history:
-        prompt_with_history += f"{entry['role']}: {entry['content']}\n"
-    prompt_with_history += f"user: {user_message}\n"
-    prompt_with_history += "model: " # Prompt the model to generate the next part
+def build_chat_prompt(conversation, user_message: str) -> str:
+    """Assembles the system prompt, rolling summary, recent turns and new message."""
+    prompt_parts = [CHAT_SYSTEM_PROMPT, "\n"]
+    if conversation.summary:
+        prompt_parts.append(f"--- Summary of Earlier Conversation ---\n{conversation.summary}\n")
+    prompt_parts.append("--- Conversation History ---")
+    prompt_parts.extend(f"{entry['role']}: {entry['content']}" for entry in conversation.turns)
+    prompt_parts.append(f"user: {user_message}")
+    prompt_parts.append("model: ") # Prompt the model to generate the next part
+    return "\n".join(prompt_parts)
+
+def generate_chat_response(user_id: str, user_message: str) -> str:
+    """Generates a conversational response using the Gemini model."""
+    
+    model = gemini.get().GenerativeModel('gemini-2.5-flash')
+    conversation = conversation_store.get(user_id)
+    prompt_with_history = build_chat_prompt(conversation, user_message)
 
     try:
-        response = model.generate_content(prompt_with_history)
+        response = call_llm('gemini-2.5-flash', "chat", model.generate_content, prompt_with_history)
         ai_response = response.text
 
-        history.append({"role": "user", "content": user_message})
-        history.append({"role": "model", "content": ai_response})
-        conversation_history[user_id] = history
+        conversation.append_exchange(user_message, ai_response, CHAT_MAX_TURNS, CHAT_TOKEN_BUDGET)
+        conversation_store.save(user_id, conversation)
 
         return ai_response
     except Exception as e:
         return f"Sorry, I encountered an error: {str(e)}"
 
+def stream_chat_response(user_id: str, user_message: str):
+    """
+    Yields the Gemini reply chunk by chunk as it is generated. The full reply
+    is appended to the conversation history once the stream completes.
+    """
+    model = gemini.get().GenerativeModel('gemini-2.5-flash')
+    conversation = conversation_store.get(user_id)
+    prompt_with_history = build_chat_prompt(conversation, user_message)
+
+    chunks = []
+    stream = model.generate_content(prompt_with_history, stream=True)
+    for chunk in traced_stream('gemini-2.5-flash', "chat_stream", stream):
+        text = chunk.text
+        if text:
+            chunks.append(text)
+            yield text
+
+    conversation.append_exchange(user_message, "".join(chunks), CHAT_MAX_TURNS, CHAT_TOKEN_BUDGET)
+    conversation_store.save(user_id, conversation)
+
 
 # --- NEW: Flask Endpoint for Conversation ---
 @app.route("/chat", methods=["POST"])
 def chat_handler():
     """Handles the conversational chat with the user."""
-    data = request.get_json()
+    data = request.get_json(silent=True)
     if not data or "user_id" not in data or "message" not in data:
         return jsonify({"error": "Request must be JSON with 'user_id' and 'message' fields"}), 400
 
@@ -79,19 +150,66 @@ def chat_handler():
 
     return jsonify({"reply": ai_reply})
 
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream_handler():
+    """
+    Same input as /chat, but streams the reply as Server-Sent Events:
+    'token' events with each text chunk, then 'done' with the full reply
+    (or 'error' if generation fails part-way).
+    """
+    data = request.get_json(silent=True)
+    if not data or "user_id" not in data or "message" not in data:
+        return jsonify({"error": "Request must be JSON with 'user_id' and 'message' fields"}), 400
+
+    user_id = data["user_id"]
+    user_message = data["message"]
+
+    def generate():
+        chunks = []
+        try:
+            for text in stream_chat_response(user_id, user_message):
+                chunks.append(text)
+                yield sse_event("token", {"text": text})
+        except Exception as e:
+            yield sse_event("error", {"error": f"Sorry, I encountered an error: {str(e)}"})
+            return
+        yield sse_event("done", {"reply": "".join(chunks)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # --- Graph Node Functions ---
+def state_budget(state: SupervisorState) -> Budget:
+    deadline = state.get("deadline")
+    return Budget(deadline) if deadline else Budget.from_seconds(PIPELINE_BUDGET_SECONDS)
+
 def detect_damage(state: SupervisorState) -> SupervisorState:
     """Node 1: Calls the external damage detection API."""
     state["progress_message"] = "Step 1/3: Analyzing image for damage..."
     print(f"---SUPERVISOR: {state['progress_message']}---")
     try:
-        image_bytes = base64.b64decode(state["image_base64"])
-        image_file = io.BytesIO(image_bytes)
-        response = requests.post(DETECTION_API_URL, files={"image": ("image.jpg", image_file, "image/jpeg")})
+        image = (
+            state.get("image_filename") or "image.jpg",
+            state["image_bytes"],
+            state.get("image_mime_type") or "image/jpeg",
+        )
+        # Streamed from the state's bytes rather than assembled into a second copy by files=
+        body = MultipartBody({"image": image})
+        response = http_client.post(
+            DETECTION_API_URL, data=body, headers={"Content-Type": body.content_type},
+            budget=state_budget(state), idempotent=True,
+        )
         response.raise_for_status()
         state["detection_result"] = response.json()
-        popped_value = state.pop('image_base64')
-        print(state.keys())
+        state["image_bytes"] = None  # no later node needs the image
+        # Streamed once this node finishes, so describe what happens next
+        if state["detection_result"].get("priority") != "None":
+            state["progress_message"] = "Damage detected. Step 2/3: Generating maintenance form..."
+        else:
+            state["progress_message"] = "Done. No damage detected."
     except Exception as e:
         state["error"] = f"Detection Agent failed: {str(e)}"
     return state
@@ -101,11 +219,13 @@ def generate_form(state: SupervisorState) -> SupervisorState:
     state["progress_message"] = "Step 2/3: Generating maintenance form..."
     print(f"---SUPERVISOR: {state['progress_message']}---")
     try:
-        payload = state["detection_result"] # Pass the entire detection result
-        response = requests.post(FORMS_API_URL, json=payload)
+        # Pass the entire detection result, plus who/when so the Forms Agent
+        # can fill aircraft_id and inspection_zone from the assignment table
+        payload = {**state["detection_result"], "user_info": state.get("user_info", {})}
+        response = http_client.post(FORMS_API_URL, json=payload, budget=state_budget(state), idempotent=True)
         response.raise_for_status()
         state["form_response"] = response.json()
-        state.pop('image_base64')
+        state["progress_message"] = "Form generated. Step 3/3: Submitting final report to database..."
     except Exception as e:
         state["error"] = f"Forms Agent failed: {str(e)}"
     return state
@@ -116,11 +236,11 @@ def submit_report(state: SupervisorState) -> SupervisorState:
     print(f"---SUPERVISOR: {state['progress_message']}---")
     try:
         form_string = state["form_response"]
-        response = requests.post(SUBMISSION_API_URL, json=form_string)
+        # Ticket IDs are content hashes, so a retried submission upserts the same record
+        response = http_client.post(SUBMISSION_API_URL, json=form_string, budget=state_budget(state), idempotent=True)
         response.raise_for_status()
         state["submission_response"] = response.json()
         state["progress_message"] = "Done. Report submitted successfully."
-        state.pop('image_base64')
     except json.JSONDecodeError:
         state["error"] = "Forms agent returned invalid JSON."
     except Exception as e:
@@ -140,37 +260,185 @@ def should_proceed(state: SupervisorState) -> str:
         return "end_workflow"
 
 # --- Build the LangGraph Workflow ---
-workflow = StateGraph(SupervisorState)
-workflow.add_node("detect_damage_node", detect_damage)
-workflow.add_node("generate_form_node", generate_form)
-workflow.add_node("submit_report_node", submit_report)
-
-workflow.set_entry_point("detect_damage_node")
-workflow.add_conditional_edges("detect_damage_node", should_proceed, {
-    "continue_to_form": "generate_form_node",
-    "end_workflow": END
-})
-workflow.add_edge("generate_form_node", "submit_report_node")
-workflow.add_edge("submit_report_node", END)
-
-supervisor_graph = workflow.compile()
-
-# --- Flask Endpoint with Streaming ---
+def build_supervisor_graph():
+    from langgraph.graph import StateGraph, END
+
+    workflow = StateGraph(SupervisorState)
+    workflow.add_node("detect_damage_node", traced_node("supervisor", "detect_damage_node", detect_damage))
+    workflow.add_node("generate_form_node", traced_node("supervisor", "generate_form_node", generate_form))
+    workflow.add_node("submit_report_node", traced_node("supervisor", "submit_report_node", submit_report))
+
+    workflow.set_entry_point("detect_damage_node")
+    workflow.add_conditional_edges("detect_damage_node", should_proceed, {
+        "continue_to_form": "generate_form_node",
+        "end_workflow": END
+    })
+    workflow.add_edge("generate_form_node", "submit_report_node")
+    workflow.add_edge("submit_report_node", END)
+
+    return workflow.compile()
+
+supervisor_graph = LazyResource("graph", build_supervisor_graph, startup)
+install_health_endpoints(app, [gemini, supervisor_graph], startup)
+
+# --- Batch Inspection ---
+PRIORITY_RANK = {"None": 0, "Low": 1, "Medium": 2, "High": 3, "Severe": 4}
+
+def group_findings(image_states: list) -> dict:
+    """Groups successful damage detections by normalized item name."""
+    groups = {}
+    for image_state in image_states:
+        detection = image_state.get("detection_result")
+        if image_state.get("error") or not detection or detection.get("priority") == "None":
+            continue
+        item_key = " ".join(str(detection.get("item", "Unknown item")).lower().split())
+        groups.setdefault(item_key, []).append(image_state)
+    return groups
+
+def merge_group_detection(group: list) -> dict:
+    """Folds a group's detections into one: highest priority wins, descriptions are joined."""
+    detections = [image_state["detection_result"] for image_state in group]
+    merged = dict(max(detections, key=lambda d: PRIORITY_RANK.get(d.get("priority"), 0)))
+    descriptions = list(dict.fromkeys(d.get("description", "") for d in detections if d.get("description")))
+    if len(descriptions) > 1:
+        merged["description"] = f"{len(group)} images: " + " | ".join(descriptions)
+    return merged
+
+def run_batch_pipeline(images: list, user_info: dict) -> dict:
+    """
+    Runs detection for every (filename, bytes, mime type) image concurrently,
+    then one form + submission per item group, also concurrently. Wall-clock
+    time tracks the slowest image rather than the sum of all of them.
+    """
+    deadline = Budget.from_seconds(PIPELINE_BUDGET_SECONDS).deadline
+    image_states = [
+        {"image_filename": filename, "image_bytes": image_bytes, "image_mime_type": mime_type,
+         "user_info": user_info, "deadline": deadline}
+        for filename, image_bytes, mime_type in images
+    ]
+    with ThreadPoolExecutor(max_workers=BATCH_MAX_WORKERS) as pool:
+        detect = with_request_id(traced_node("supervisor_batch", "detect_damage", detect_damage))
+        image_states = list(pool.map(detect, image_states))
+
+        groups = group_findings(image_states)
+        group_states = [
+            {"user_info": user_info, "detection_result": merge_group_detection(group), "deadline": deadline}
+            for group in groups.values()
+        ]
+
+        def form_and_submit(group_state):
+            group_state = traced_node("supervisor_batch", "generate_form", generate_form)(group_state)
+            if not group_state.get("error"):
+                group_state = traced_node("supervisor_batch", "submit_report", submit_report)(group_state)
+            return group_state
+
+        group_states = list(pool.map(with_request_id(form_and_submit), group_states))
+
+    results_by_item = dict(zip(groups, group_states))
+    group_of = {id(member): item_key for item_key, group in groups.items() for member in group}
+    image_results = []
+    for image_state in image_states:
+        result = {
+            "image_filename": image_state.get("image_filename"),
+            "detection_result": image_state.get("detection_result"),
+            "error": image_state.get("error"),
+        }
+        item_key = group_of.get(id(image_state))
+        if item_key is not None:
+            group_state = results_by_item[item_key]
+            result["group"] = item_key
+            result["form_response"] = group_state.get("form_response")
+            result["submission_response"] = group_state.get("submission_response")
+            result["error"] = group_state.get("error")
+        image_results.append(result)
+
+    return {
+        "images": image_results,
+        "groups": {
+            item_key: {
+                "image_filenames": [member.get("image_filename") for member in groups[item_key]],
+                "detection_result": group_state.get("detection_result"),
+                "form_response": group_state.get("form_response"),
+                "submission_response": group_state.get("submission_response"),
+                "error": group_state.get("error"),
+            }
+            for item_key, group_state in results_by_item.items()
+        },
+    }
+
+# --- Request Helpers ---
+# Fields that only exist to carry the upload and deadline through the graph
+INTERNAL_STATE_KEYS = ("image_bytes", "image_filename", "image_mime_type", "deadline")
+
+def initial_state_from_request() -> SupervisorState:
+    """Builds the graph input from a multipart request with 'image' and 'user'."""
+    image_file = request.files["image"]
+    return {
+        "image_bytes": image_file.read(),
+        "image_filename": image_file.filename,
+        "image_mime_type": image_file.mimetype,
+        "user_info": json.loads(request.form["user"]),
+        "deadline": Budget.from_seconds(PIPELINE_BUDGET_SECONDS).deadline,
+    }
+
+def public_state(state: dict) -> dict:
+    """Returns a JSON-safe copy of a (partial) state without the image payload."""
+    return {key: value for key, value in state.items() if key not in INTERNAL_STATE_KEYS}
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+# --- Job Mode ---
+def run_pipeline_job(payload: dict, image_bytes: bytes, progress) -> dict:
+    """
+    Runs one queued pipeline through the graph, persisting the merged partial
+    state after every node. The time budget starts when the job does, not
+    when it was queued.
+    """
+    set_request_id(payload.get("request_id"))
+    initial_state = {
+        "image_bytes": image_bytes,
+        "image_filename": payload.get("image_filename"),
+        "image_mime_type": payload.get("image_mime_type"),
+        "user_info": payload.get("user_info", {}),
+        "deadline": Budget.from_seconds(PIPELINE_BUDGET_SECONDS).deadline,
+    }
+    final_state = {}
+    for update in supervisor_graph.get().stream(initial_state):
+        for node_state in update.values():
+            final_state.update(public_state(node_state or {}))
+            progress(final_state)
+
+    if not final_state.get("error") and "form_response" not in final_state:
+        final_state["progress_message"] = "Done. No damage detected."
+    return final_state
+
+# `python supervisorAgent.py` runs with the debug reloader, which executes this module in a
+# watcher process and again in the child that serves requests; only the latter starts workers
+SERVING_PROCESS = __name__ != "__main__" or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+
+# A job's lease outlives its pipeline budget, so only jobs of a dead worker are retried
+job_queue = JobQueue(
+    JOB_QUEUE_DB_PATH, run_pipeline_job, workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING,
+    max_starts_per_second=JOB_MAX_STARTS_PER_SECOND, lease_seconds=PIPELINE_BUDGET_SECONDS + 60,
+    max_attempts=JOB_MAX_ATTEMPTS, retention_seconds=JOB_RETENTION_SECONDS,
+)
+if SERVING_PROCESS:
+    job_queue.start()
+
+# --- Flask Endpoints ---
 @app.route("/supervisor", methods=["POST"])
 def supervisor_endpoint():
     """Handles a single POST request and returns final structured output once."""
     try:
         if "image" not in request.files or "user" not in request.form:
             return jsonify({"error": "Request must be multipart/form-data with 'image' and 'user' fields"}), 400
+        try:
+            initial_state = initial_state_from_request()
+        except json.JSONDecodeError as e:
+            return jsonify({"error": f"'user' must be valid JSON: {str(e)}"}), 400
 
-        image_bytes = request.files["image"].read()
-        initial_state = {
-            "image_base64": base64.b64encode(image_bytes).decode('utf-8'),
-            "user_info": json.loads(request.form["user"])
-        }
-
-        final_state = supervisor_graph.invoke(initial_state)
-        final_state.pop("image_base64", None)
+        final_state = public_state(supervisor_graph.get().invoke(initial_state))
         final_state.pop("progress_message", None)
 
         return jsonify(final_state)
@@ -178,7 +446,118 @@ def supervisor_endpoint():
     except Exception as e:
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
+@app.route("/supervisor/stream", methods=["POST"])
+def supervisor_stream_endpoint():
+    """
+    Same input as /supervisor, but streams Server-Sent Events as each node
+    finishes: one event per node (detection, then form, then ticket) carrying
+    its partial results and a progress_message saying what happens next, and
+    a final 'done' event with the merged state.
+    """
+    if "image" not in request.files or "user" not in request.form:
+        return jsonify({"error": "Request must be multipart/form-data with 'image' and 'user' fields"}), 400
+    try:
+        initial_state = initial_state_from_request()
+    except json.JSONDecodeError as e:
+        return jsonify({"error": f"'user' must be valid JSON: {str(e)}"}), 400
+
+    def generate():
+        final_state = {}
+        yield sse_event("progress", {"progress_message": "Step 1/3: Analyzing image for damage..."})
+        try:
+            for update in supervisor_graph.get().stream(initial_state):
+                for node_name, node_state in update.items():
+                    node_state = public_state(node_state or {})
+                    final_state.update(node_state)
+                    yield sse_event(node_name, node_state)
+        except Exception as e:
+            final_state["error"] = f"An unexpected error occurred: {str(e)}"
+
+        if not final_state.get("error") and "form_response" not in final_state:
+            final_state["progress_message"] = "Done. No damage detected."
+        yield sse_event("done", final_state)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.route("/supervisor/batch", methods=["POST"])
+def supervisor_batch_endpoint():
+    """
+    Handles one inspection with several photos: multipart/form-data with one
+    or more 'images' (or 'image') files and a 'user' field. Returns per-image
+    results plus one form/submission per damaged item.
+    """
+    try:
+        image_files = request.files.getlist("images") or request.files.getlist("image")
+        if not image_files or "user" not in request.form:
+            return jsonify({"error": "Request must be multipart/form-data with 'images' files and a 'user' field"}), 400
+
+        try:
+            user_info = json.loads(request.form["user"])
+        except json.JSONDecodeError as e:
+            return jsonify({"error": f"'user' must be valid JSON: {str(e)}"}), 400
+
+        images = [(f.filename, f.read(), f.mimetype) for f in image_files]
+        return jsonify(run_batch_pipeline(images, user_info))
+
+    except Exception as e:
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+@app.route("/supervisor/jobs", methods=["POST"])
+def submit_job_endpoint():
+    """
+    Same input as /supervisor, but only queues the pipeline and answers 202
+    with a job ID at once. Poll GET /supervisor/jobs/<job_id> for its status,
+    partial results and final state.
+    """
+    if "image" not in request.files or "user" not in request.form:
+        return jsonify({"error": "Request must be multipart/form-data with 'image' and 'user' fields"}), 400
+    try:
+        user_info = json.loads(request.form["user"])
+    except json.JSONDecodeError as e:
+        return jsonify({"error": f"'user' must be valid JSON: {str(e)}"}), 400
+
+    image_file = request.files["image"]
+    payload = {
+        "user_info": user_info,
+        "image_filename": image_file.filename,
+        "image_mime_type": image_file.mimetype,
+        "request_id": current_request_id(),
+    }
+    try:
+        job_id = job_queue.submit(payload, image_file.read())
+    except QueueFullError as e:
+        return jsonify({"error": f"Job queue is full, retry later: {str(e)}"}), 429
+
+    return jsonify({"job_id": job_id, "status": "queued", "status_url": f"/supervisor/jobs/{job_id}"}), 202
+
+@app.route("/supervisor/jobs/<job_id>", methods=["GET"])
+def job_status_endpoint(job_id):
+    """Returns a job's status (queued, running, succeeded or failed) and its (partial) result."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job '{job_id}'"}), 404
+    return jsonify(job)
+
+@app.route("/job_stats", methods=["GET"])
+def job_stats_endpoint():
+    """Queue depth, per-status counts and worker pool counters."""
+    return jsonify(job_queue.stats())
+
+@app.route("/http_stats", methods=["GET"])
+def http_stats_endpoint():
+    """Connection pool, retry and circuit breaker counters per downstream agent."""
+    return jsonify(http_client.stats())
+
 # --- Start the Supervisor Flask App ---
+# Heavy SDK imports and graph compilation happen while the server starts accepting connections
+if SERVING_PROCESS:
+    warm_up(supervisor_graph, gemini)
+startup.mark("module_loaded")
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8085))
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import types
+
+# Injected latency per call, in milliseconds: base +/- uniform jitter
+LLM_LATENCY_MS = float(os.environ.get("FAKE_LLM_LATENCY_MS", 800))
+EMBED_LATENCY_MS = float(os.environ.get("FAKE_EMBED_LATENCY_MS", 150))
+VECTOR_LATENCY_MS = float(os.environ.get("FAKE_VECTOR_LATENCY_MS", 50))
+JITTER_FRACTION = float(os.environ.get("FAKE_LATENCY_JITTER", 0.2))
+
+# Items the fake vision model reports; some match the synthetic precedents, some do not
+FAKE_FINDINGS = [
+    ("Damaged Aircraft Infrastructure", "Passenger seat", "Seat cushion upholstery has a 4-inch tear exposing foam.", "Medium"),
+    ("Damaged Aircraft Infrastructure", "Tray table", "Tray table latch is broken and the table will not stay stowed.", "Medium"),
+    ("Damaged Aircraft Infrastructure", "Overhead compartment latch", "The latch mechanism is broken and hanging loose.", "High"),
+    ("Damaged Aircraft Infrastructure", "Lavatory door", "Lavatory door lock indicator is cracked and sticks.", "Low"),
+    ("Damaged Baggage", "Blue suitcase", "Large crack across the front shell.", "High"),
+]
+
+
+def _delay(milliseconds: float) -> float:
+    jitter = milliseconds * JITTER_FRACTION
+    return max(0.0, milliseconds + random.uniform(-jitter, jitter)) / 1000
+
+
+def _flatten(contents):
+    """Splits generate_content input into (text, number of image parts)."""
+    if isinstance(contents, str):
+        return contents, 0
+    texts, images = [], 0
+    for part in contents:
+        if isinstance(part, str):
+            texts.append(part)
+        elif isinstance(part, dict) and "data" in part:
+            images += 1
+    return "\n".join(texts), images
+
+
+def _finding(seed: str, index: int = 1) -> dict:
+    digest = int(hashlib.sha256(f"{seed}:{index}".encode()).hexdigest(), 16)
+    issue_type, item, description, priority = FAKE_FINDINGS[digest % len(FAKE_FINDINGS)]
+    x, y = (digest >> 8) % 50 / 100, (digest >> 16) % 50 / 100
+    return {
+        "type": issue_type,
+        "item": item,
+        "description": description,
+        "priority": priority,
+        "bbox": {"x_min": x, "y_min": y, "x_max": x + 0.3, "y_max": y + 0.3},
+    }
+
+
+def fake_reply(contents) -> str:
+    """A plausible reply for each prompt the agents send."""
+    text, images = _flatten(contents)
+    seed = hashlib.sha256(repr(contents if isinstance(contents, str) else text).encode()).hexdigest()
+    if '"image_index"' in text:
+        return json.dumps([{"image_index": i, **_finding(seed, i)} for i in range(1, images + 1)])
+    if "aviation maintenance inspector" in text:
+        return "```json\n" + json.dumps(_finding(seed)) + "\n```"
+    if '"form_id": "_____"' in text:
+        finding = _finding(seed)
+        return json.dumps({
+            "form_id": "Form-SIG",
+            "date": time.strftime("%Y-%m-%d"),
+            "aircraft_id": "N/A",
+            "inspection_zone": "Cabin",
+            "issue_type": finding["item"],
+            "issue_description": finding["description"],
+            "severity": finding["priority"],
+            "action_taken": "Marked out of service pending maintenance.",
+            "department_contacted": "Maintenance",
+            "status": "open",
+        })
+    if "brief query" in text:
+        return "how to inspect and report damaged cabin equipment"
+    return ("Per the interior inspection manual, document the damage, mark the item out of service "
+            "and contact Maintenance. Use the Seat Inspection Guidelines form.")
+
+
+class _UsageMetadata:
+    def __init__(self, prompt: str, reply: str):
+        self.prompt_token_count = len(prompt) // 4 + 1
+        self.candidates_token_count = len(reply) // 4 + 1
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class _Response:
+    def __init__(self, text: str, prompt: str = ""):
+        self.text = text
+        self.usage_metadata = _UsageMetadata(prompt, text)
+
+
+class FakeGenerativeModel:
+    """Stand-in for google.generativeai.GenerativeModel."""
+
+    def __init__(self, model_name: str = "", **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, contents, stream: bool = False, **kwargs):
+        time.sleep(_delay(LLM_LATENCY_MS))
+        reply = fake_reply(contents)
+        if stream:
+            words = reply.split(" ")
+            return iter([_Response(word + " ") for word in words])
+        return _Response(reply, _flatten(contents)[0])
+
+    async def generate_content_async(self, contents, **kwargs):
+        await asyncio.sleep(_delay(LLM_LATENCY_MS))
+        return _Response(fake_reply(contents), _flatten(contents)[0])
+
+
+def fake_embedding(text: str, dimensions: int) -> list:
+    """Deterministic unit vector, so identical reports embed identically."""
+    rng = random.Random(hashlib.sha256(text.encode()).digest())
+    values = [rng.gauss(0, 1) for _ in range(dimensions)]
+    norm = math.sqrt(sum(v * v for v in values)) or 1
+    return [v / norm for v in values]
+
+
+class _Models:
+    def embed_content(self, model=None, contents=None, config=None, **kwargs):
+        time.sleep(_delay(EMBED_LATENCY_MS))
+        dimensions = getattr(config, "output_dimensionality", None) or 768
+        items = [contents] if isinstance(contents, str) else list(contents)
+        embeddings = [types.SimpleNamespace(values=fake_embedding(item, dimensions)) for item in items]
+        return types.SimpleNamespace(embeddings=embeddings)
+
+
+class FakeGenAIClient:
+    """Stand-in for google.genai.Client."""
+
+    def __init__(self, api_key=None, **kwargs):
+        self.models = _Models()
+
+
+class EmbedContentConfig:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeIndex:
+    """In-memory stand-in for a Pinecone index: brute-force cosine per namespace."""
+
+    def __init__(self):
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, namespace: str = ""):
+        time.sleep(_delay(VECTOR_LATENCY_MS))
+        with self._lock:
+            store = self._namespaces.setdefault(namespace, {})
+            for vector in vectors:
+                store[vector["id"]] = (vector["values"], vector.get("metadata") or {})
+        return {"upserted_count": len(vectors)}
+
+    def query(self, vector, top_k: int = 5, namespace: str = "", include_metadata: bool = False, **kwargs):
+        time.sleep(_delay(VECTOR_LATENCY_MS))
+        with self._lock:
+            items = list(self._namespaces.get(namespace, {}).items())
+        query_norm = math.sqrt(sum(v * v for v in vector)) or 1
+        scored = []
+        for vector_id, (values, metadata) in items:
+            norm = math.sqrt(sum(v * v for v in values)) or 1
+            score = sum(a * b for a, b in zip(vector, values)) / (norm * query_norm)
+            scored.append({"id": vector_id, "score": score, "metadata": metadata if include_metadata else {}})
+        scored.sort(key=lambda match: match["score"], reverse=True)
+        return {"matches": scored[:top_k]}
+
+
+class FakePinecone:
+    """Stand-in for pinecone.Pinecone; every Index() shares one in-memory index."""
+
+    _index = FakeIndex()
+
+    def __init__(self, api_key=None, **kwargs):
+        pass
+
+    def Index(self, name=None, host=None, **kwargs):
+        return self._index
+
+
+def _module(name: str, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def install():
+    """Registers the stand-ins under the SDK module names before a service imports them."""
+    try:
+        import google
+    except ImportError:
+        google = _module("google", __path__=[])
+        sys.modules["google"] = google
+
+    generativeai = _module("google.generativeai", configure=lambda **kwargs: None, GenerativeModel=FakeGenerativeModel)
+    genai_types = _module("google.genai.types", EmbedContentConfig=EmbedContentConfig)
+    genai = _module("google.genai", Client=FakeGenAIClient, types=genai_types, __path__=[])
+    pinecone = _module("pinecone", Pinecone=FakePinecone)
+
+    sys.modules.update({
+        "google.generativeai": generativeai,
+        "google.genai": genai,
+        "google.genai.types": genai_types,
+        "pinecone": pinecone,
+    })
+    google.generativeai = generativeai
+    google.genai = genai
@@ -0,0 +1,42 @@
+import argparse
+import importlib
+import os
+import sys
+
+AGENTS_MODELING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# service name -> (directory under "agents modeling", module exposing `app`)
+SERVICES = {
+    "mcp": ("mcp_server", "main"),
+    "image": (os.path.join("Agents", "Image Detection Agent"), "imageAgent"),
+    "forms": (os.path.join("Agents", "Forms Agent"), "formsAgent"),
+    "forms_local": (os.path.join("Agents", "Forms Agent"), "formsAgent"),
+    "submission": (os.path.join("Agents", "Submission Agent"), "submissionAgent"),
+    "supervisor": (os.path.join("Agents", "Supervisor Agent"), "supervisorAgent"),
+}
+
+
+def main():
+    """Runs one service in-process with the fake Gemini/Pinecone SDKs installed."""
+    parser = argparse.ArgumentParser(description="Start one agent against local stand-ins.")
+    parser.add_argument("service", choices=sorted(SERVICES))
+    parser.add_argument("--port", type=int, required=True)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import fakes
+    fakes.install()
+
+    directory, module_name = SERVICES[args.service]
+    sys.path.insert(0, os.path.abspath(os.path.join(AGENTS_MODELING_DIR, directory)))
+    module = importlib.import_module(module_name)
+
+    if args.service == "mcp":
+        import uvicorn
+        uvicorn.run(module.app, host="127.0.0.1", port=args.port, log_level="warning")
+    else:
+        module.app.run(host="127.0.0.1", port=args.port, threaded=True, debug=False, use_reloader=False)
+
+
+if __name__ == "__main__":
+    main()
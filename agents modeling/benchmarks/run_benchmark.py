@@ -0,0 +1,383 @@
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image, ImageDraw
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+AGENTS_MODELING_DIR = os.path.dirname(BENCHMARKS_DIR)
+DEFAULT_DATA_DIR = os.path.join(AGENTS_MODELING_DIR, "Data")
+DEFAULT_IMAGE_DIRS = [
+    os.path.join(DEFAULT_DATA_DIR, "images"),
+    os.path.join(AGENTS_MODELING_DIR, "..", "united-report-ai", "Data", "image"),
+]
+
+# Start order matters: each service's downstreams are started before it
+SERVICE_ORDER = ["mcp", "image", "forms", "forms_local", "submission", "supervisor"]
+STAGES = ["detection", "mcp", "forms", "forms_local", "submission", "end_to_end", "jobs"]
+# Per-service overrides of service_env(); forms_local embeds the MCP corpus in-process
+SERVICE_ENV = {"forms_local": {"MCP_MODE": "local"}}
+
+
+# --- Sample data ---
+
+def load_reports(data_dir: str) -> list:
+    """Flattens the synthetic interior forms into a list of report dicts."""
+    with open(os.path.join(data_dir, "synthetic_interior_forms.json")) as f:
+        sections = json.load(f)
+    return [report for section in sections for report in section.get("Reports", [])]
+
+
+def load_users(data_dir: str) -> list:
+    """Builds supervisor user_info dicts from the inspection assignments."""
+    with open(os.path.join(data_dir, "aircraft_inspection_assignments.csv"), newline="") as f:
+        return [
+            {"name": row["Inspector Name"], "inspector_id": row["Inspector ID"], "date": row["Date Assigned"]}
+            for row in csv.DictReader(f)
+        ]
+
+
+def load_base_images(image_dir: str) -> list:
+    candidates = [image_dir] if image_dir else DEFAULT_IMAGE_DIRS
+    for directory in candidates:
+        paths = sorted(
+            path for pattern in ("*.png", "*.jpg", "*.jpeg", "*.webp")
+            for path in glob.glob(os.path.join(directory, pattern))
+        )
+        if paths:
+            return [Image.open(path).convert("RGB") for path in paths]
+    # No sample photos available: fall back to plain synthetic canvases
+    return [Image.new("RGB", (1600, 1200), color) for color in ((90, 90, 110), (160, 150, 140))]
+
+
+def image_variant(base: Image.Image, rng: random.Random) -> bytes:
+    """A distinct photo-like JPEG per request, so the perceptual-hash cache sees new images."""
+    width, height = base.size
+    crop = rng.uniform(0.7, 1.0)
+    left = rng.randint(0, int(width * (1 - crop)))
+    top = rng.randint(0, int(height * (1 - crop)))
+    image = base.crop((left, top, left + int(width * crop), top + int(height * crop))).copy()
+    draw = ImageDraw.Draw(image)
+    for _ in range(4):
+        x, y = rng.randint(0, image.width - 1), rng.randint(0, image.height - 1)
+        size = rng.randint(image.width // 8, image.width // 3)
+        draw.rectangle((x, y, x + size, y + size), fill=tuple(rng.randint(0, 255) for _ in range(3)))
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=85)
+    return output.getvalue()
+
+
+# --- Services ---
+
+def prepare_workdir(workdir: str, data_dir: str):
+    """Lays out the local bucket (manuals/, forms/) and the MCP config file."""
+    for prefix, pattern in (("manuals", "*.pdf"), ("forms", "*.json")):
+        os.makedirs(os.path.join(workdir, "bucket", prefix), exist_ok=True)
+        for path in glob.glob(os.path.join(data_dir, pattern)):
+            shutil.copy(path, os.path.join(workdir, "bucket", prefix))
+    with open(os.path.join(workdir, "config.json"), "w") as f:
+        json.dump({"api_key": "benchmark"}, f)
+
+
+def service_env(args, workdir: str, ports: dict) -> dict:
+    url = lambda service, path: f"http://127.0.0.1:{ports[service]}{path}"
+    return {
+        **os.environ,
+        "PYTHONUNBUFFERED": "1",
+        "GOOGLE_API_KEY": "benchmark",
+        "GEMINI_API_KEY": "benchmark",
+        "PINECONE_API_KEY": "benchmark",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_EMBED_LATENCY_MS": str(args.embed_latency_ms),
+        "FAKE_VECTOR_LATENCY_MS": str(args.vector_latency_ms),
+        "FAKE_LATENCY_JITTER": str(args.jitter),
+        "MCP_LOCAL_DOCS_DIR": os.path.join(workdir, "bucket"),
+        "MCP_CACHE_DIR": os.path.join(workdir, "mcp_cache"),
+        "MCP_URL": url("mcp", "/query"),
+        "MCP_MODE": "remote",
+        "DETECTION_API_URL": url("image", "/analyze"),
+        "FORMS_API_URL": url("forms", "/generate_form"),
+        "SUBMISSION_API_URL": url("submission", "/submit_report"),
+        "WRITE_BEHIND_JOURNAL": os.path.join(workdir, "submission_journal.db"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.db"),
+        "JOB_QUEUE_DB_PATH": os.path.join(workdir, "supervisor_jobs.db"),
+        "VECTOR_STORE": "pinecone",  # served by the in-memory fake
+    }
+
+
+def start_service(service: str, port: int, env: dict, workdir: str) -> subprocess.Popen:
+    log = open(os.path.join(workdir, f"{service}.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, os.path.join(BENCHMARKS_DIR, "launch_service.py"), service, "--port", str(port)],
+        cwd=workdir, env={**env, **SERVICE_ENV.get(service, {})}, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def wait_until_listening(service: str, process: subprocess.Popen, port: int, workdir: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(os.path.join(workdir, f"{service}.log")) as f:
+                tail = f.read()[-2000:]
+            raise RuntimeError(f"{service} exited with code {process.returncode}:\n{tail}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{service} did not start listening on port {port} within {timeout}s")
+
+
+def wait_until_ready(service: str, port: int, timeout: float):
+    """Polls /readyz until the service's background warm-up has finished."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/readyz", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{service} did not become ready within {timeout}s")
+
+
+def peak_rss_mb(pid: int):
+    """High-water resident set size of a process (Linux /proc), in MB."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# --- Load generation ---
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_stage(name: str, call, total: int, concurrency: int, warmup: int) -> dict:
+    """Issues `total` calls with `concurrency` workers and summarises their latency."""
+    sessions = threading.local()
+
+    def timed(i):
+        if not hasattr(sessions, "session"):
+            sessions.session = requests.Session()
+        started = time.perf_counter()
+        try:
+            response = call(sessions.session, i)
+            ok = response.status_code < 300 and "error" not in (response.json() or {})
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(-warmup, 0)))
+        started = time.perf_counter()
+        results = list(pool.map(timed, range(total)))
+        wall_seconds = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for seconds, ok in results if ok)
+    errors = sum(1 for _, ok in results if not ok)
+    print(f"  {name}: {len(latencies)} ok, {errors} errors in {wall_seconds:.1f}s")
+    return {
+        "requests": total,
+        "errors": errors,
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "mean_ms": sum(latencies) / len(latencies) if latencies else 0.0,
+        "throughput_rps": len(latencies) / wall_seconds if wall_seconds else 0.0,
+    }
+
+
+def build_calls(ports: dict, reports: list, users: list, base_images: list, seed: int) -> dict:
+    url = lambda service, path: f"http://127.0.0.1:{ports[service]}{path}"
+    run_id = uuid.uuid4().hex[:8]
+
+    def image(i):
+        return image_variant(base_images[i % len(base_images)], random.Random(f"{seed}:{i}"))
+
+    def submit_and_wait(session, i):
+        """Queues a pipeline job and polls it, so the latency covers queueing plus the run."""
+        response = session.post(
+            url("supervisor", "/supervisor/jobs"),
+            files={"image": (f"bench-{i}.jpg", image(i), "image/jpeg")},
+            data={"user": json.dumps(users[i % len(users)])})
+        if response.status_code != 202:
+            return response
+        status_url = url("supervisor", response.json()["status_url"])
+        while True:
+            response = session.get(status_url)
+            if response.status_code != 200 or response.json()["status"] in ("succeeded", "failed"):
+                return response
+            time.sleep(0.05)
+
+    def generated_form(i):
+        """A report as the Supervisor submits it: the Forms Agent's reply, with the form as JSON text."""
+        report = reports[i % len(reports)]
+        # The run id and sequence number in form_id keep every submission unique (not deduplicated)
+        form = {key.lower().replace(" ", "_"): value for key, value in report.items()
+                if key not in ("Inspector Name", "Inspector ID")}
+        form["form_id"] = f"{report['Form ID']}-{run_id}-{i}"
+        return {"generated_form": json.dumps(form, indent=4)}
+
+    def finding(i):
+        report = reports[i % len(reports)]
+        return {"item": report["Issue Type"], "description": report["Issue Description"], "priority": report["Severity"]}
+
+    return {
+        "detection": lambda session, i: session.post(
+            url("image", "/analyze"), files={"image": (f"bench-{i}.jpg", image(i), "image/jpeg")}),
+        "mcp": lambda session, i: session.post(
+            url("mcp", "/query"), json={"query": finding(i)["description"]}),
+        "forms": lambda session, i: session.post(
+            url("forms", "/generate_form"), json={**finding(i), "user_info": users[i % len(users)]}),
+        "forms_local": lambda session, i: session.post(
+            url("forms_local", "/generate_form"), json={**finding(i), "user_info": users[i % len(users)]}),
+        "submission": lambda session, i: session.post(url("submission", "/submit_report"), json=generated_form(i)),
+        "end_to_end": lambda session, i: session.post(
+            url("supervisor", "/supervisor"),
+            files={"image": (f"bench-{i}.jpg", image(i), "image/jpeg")},
+            data={"user": json.dumps(users[i % len(users)])}),
+        "jobs": submit_and_wait,
+    }
+
+
+# --- Reporting ---
+
+def print_report(results: dict):
+    print(f"\n{'stage':<12}{'ok':>6}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+    for stage, r in results["stages"].items():
+        print(f"{stage:<12}{r['requests'] - r['errors']:>6}{r['errors']:>6}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['throughput_rps']:>9.2f}")
+    print("\npeak RSS (MB): " + ", ".join(
+        f"{service} {rss:.0f}" if rss is not None else f"{service} n/a"
+        for service, rss in results["peak_rss_mb"].items()
+    ))
+    print("startup (s, listening/ready): " + ", ".join(
+        f"{service} {s['listening']:.1f}/{s['ready']:.1f}" for service, s in results.get("startup_seconds", {}).items()
+    ))
+
+
+def find_regressions(results: dict, baseline: dict, max_regression: float) -> list:
+    """Stages whose p95 grew by more than max_regression relative to the baseline."""
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if previous and previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{stage}: p95 {previous['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end benchmark of the agents against a fake LLM, "
+                    "a local-directory bucket and an in-memory vector store."
+    )
+    parser.add_argument("--requests", type=int, default=50, help="measured requests per stage")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests per stage")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--embed-latency-ms", type=float, default=150)
+    parser.add_argument("--vector-latency-ms", type=float, default=50)
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency jitter as a fraction of the base")
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--image-dir", default=None, help="sample photos (default: Data/images or the app's sample image)")
+    parser.add_argument("--base-port", type=int, default=18080)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare p95 against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 growth vs the baseline")
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="agents-benchmark-")
+    ports = {service: args.base_port + i for i, service in enumerate(SERVICE_ORDER)}
+    processes = {}
+    try:
+        prepare_workdir(workdir, args.data_dir)
+        env = service_env(args, workdir, ports)
+        print(f"Starting services in {workdir}")
+        startup_seconds = {}
+        for service in SERVICE_ORDER:
+            startup_started = time.perf_counter()
+            processes[service] = start_service(service, ports[service], env, workdir)
+            wait_until_listening(service, processes[service], ports[service], workdir, args.startup_timeout)
+            listening = time.perf_counter() - startup_started
+            wait_until_ready(service, ports[service], args.startup_timeout)
+            ready = time.perf_counter() - startup_started
+            startup_seconds[service] = {"listening": round(listening, 3), "ready": round(ready, 3)}
+            print(f"  {service} listening on {ports[service]} after {listening:.1f}s, ready after {ready:.1f}s")
+
+        calls = build_calls(ports, load_reports(args.data_dir), load_users(args.data_dir),
+                            load_base_images(args.image_dir), args.seed)
+        print(f"Running {args.requests} requests per stage at concurrency {args.concurrency}")
+        results = {
+            "config": {key: value for key, value in vars(args).items() if key not in ("json_path", "baseline")},
+            "stages": {
+                stage: run_stage(stage, calls[stage], args.requests, args.concurrency, args.warmup)
+                for stage in stages
+            },
+            "peak_rss_mb": {service: peak_rss_mb(process.pid) for service, process in processes.items()},
+            "startup_seconds": startup_seconds,
+        }
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if args.keep_workdir:
+            print(f"Logs and state kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.max_regression)
+        if regressions:
+            print("\nRegressions beyond {:.0%}:".format(args.max_regression))
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo p95 regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import sys
+import zlib
+from array import array
+from collections import OrderedDict, namedtuple
+from retrieval import BM25Index, build_index
+
+# Precomputed forms/manuals/combined indexes over one shared CorpusStore
+Corpus = namedtuple("Corpus", ["version", "store", "manuals", "forms", "combined"])
+
+
+class CorpusStore:
+    """
+    Immutable, compact holder for every loaded document's text.
+
+    Names are interned and all texts live in one contiguous buffer addressed
+    by offsets, so retrieval chunks are (doc_id, start, end) spans and only the
+    selected slices are materialised per request. With compress=True each
+    document is kept zlib-compressed instead, and only the hot_documents most
+    recently read are held decompressed.
+    """
+
+    def __init__(self, documents, compress=False, hot_documents=32):
+        self.names = tuple(sys.intern(name) for name in documents)
+        self.doc_ids = {name: doc_id for doc_id, name in enumerate(self.names)}
+        self.compressed = compress
+        texts = documents.values()
+
+        if compress:
+            self._buffer = None
+            self._blobs = tuple(zlib.compress(text.encode("utf-8")) for text in texts)
+            self._hot = OrderedDict()
+            self._hot_limit = hot_documents
+        else:
+            self._offsets = array("q", [0])
+            for text in texts:
+                self._offsets.append(self._offsets[-1] + len(text))
+            self._buffer = "".join(texts)
+
+    def __len__(self):
+        return len(self.names)
+
+    def ids_for(self, names):
+        return [self.doc_ids[name] for name in names]
+
+    def document(self, doc_id):
+        """Returns the full text of one document."""
+        if not self.compressed:
+            return self._buffer[self._offsets[doc_id]:self._offsets[doc_id + 1]]
+
+        text = self._hot.get(doc_id)
+        if text is None:
+            text = zlib.decompress(self._blobs[doc_id]).decode("utf-8")
+            self._hot[doc_id] = text
+            if len(self._hot) > self._hot_limit:
+                self._hot.popitem(last=False)
+        else:
+            self._hot.move_to_end(doc_id)
+        return text
+
+    def slice(self, doc_id, start, end):
+        """Returns text[start:end] of one document without copying the rest of it."""
+        if not self.compressed:
+            base = self._offsets[doc_id]
+            return self._buffer[base + start:base + end]
+        return self.document(doc_id)[start:end]
+
+    def nbytes(self):
+        """Approximate size of the stored text payload."""
+        if self.compressed:
+            return sum(len(blob) for blob in self._blobs)
+        return sys.getsizeof(self._buffer)
+
+
+def build_corpus(version, manuals, forms, compress=False):
+    """
+    Packs {name: text} manuals and forms into one CorpusStore and indexes the
+    three views once; the combined index reuses the per-view chunks.
+    """
+    store = CorpusStore({**manuals, **forms}, compress=compress)
+    manuals_index = build_index(store, store.ids_for(manuals))
+    forms_index = build_index(store, store.ids_for(forms))
+    combined_index = BM25Index(store, manuals_index.chunks + forms_index.chunks)
+    return Corpus(version, store, manuals_index, forms_index, combined_index)
@@ -0,0 +1,51 @@
+import hashlib
+import os
+import tempfile
+
+
+def cache_key(name, version):
+    return hashlib.sha256(f"{name}\0{version}".encode("utf-8")).hexdigest()
+
+
+class DocumentCache:
+    """
+    On-disk cache of extracted document text, keyed by blob name + version.
+
+    A changed blob gets a new version and therefore a new key, so stale
+    entries are never served; prune() removes them after a refresh.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.environ.get(
+            "MCP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "mcp_doc_cache")
+        )
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def get(self, name, version):
+        try:
+            with open(self._path(cache_key(name, version)), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, name, version, text):
+        # Write to a temp file and rename so readers never see a partial entry
+        path = self._path(cache_key(name, version))
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def prune(self, listings):
+        """Deletes entries that no longer match any {name: version} listing."""
+        live = {
+            f"{cache_key(name, version)}.txt"
+            for listing in listings
+            for name, version in listing.items()
+        }
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(".txt") and filename not in live:
+                os.remove(os.path.join(self.cache_dir, filename))
@@ -0,0 +1,57 @@
+import asyncio
+
+
+class GenerationGate:
+    """
+    Bounds concurrent LLM calls and applies a per-request deadline.
+
+    Requests beyond max_in_flight wait on a semaphore; the timeout covers both
+    that wait and the call itself. Counters are exposed through stats().
+    """
+
+    def __init__(self, max_in_flight=8, timeout_seconds=30.0):
+        self.max_in_flight = max_in_flight
+        self.timeout_seconds = timeout_seconds
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+
+    async def _run(self, call):
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            return await call()
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def run(self, call):
+        """Awaits call() once a slot is free; raises asyncio.TimeoutError on deadline."""
+        try:
+            result = await asyncio.wait_for(self._run(call), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return result
+
+    def stats(self):
+        return {
+            "max_in_flight": self.max_in_flight,
+            "timeout_seconds": self.timeout_seconds,
+            "queue_depth": self.waiting,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+        }
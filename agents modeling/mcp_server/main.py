@@ -1,43 +1,148 @@
 from fastapi import FastAPI, Request
-import google.generativeai as genai
+from fastapi.responses import JSONResponse
+import asyncio
 import json
 import os
-from manual_loader import download_documents
+import sys
+import threading
+import time
+from doc_cache import DocumentCache
+from generation_gate import GenerationGate
+from manual_loader import load_corpus as load_documents_corpus
 from prompt_utils import build_prompt
+from query_cache import QueryCache
+from storage_backends import get_backend
+
+# Modules shared by all agents live in "agents modeling/shared"
+sys.path.append(os.environ.get(
+    "AGENTS_SHARED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared")
+))
+from instrumentation import call_llm_async, install_fastapi
+from startup import STARTUP_WARM_UP, LazyResource, StartupProfile, install_fastapi_health_endpoints, warm_up
+
+startup = StartupProfile("mcp_server")
+
+BUCKET_NAME = os.environ.get("MCP_BUCKET", "airline_data_mcp")
+REFRESH_INTERVAL_SECONDS = int(os.environ.get("MCP_REFRESH_SECONDS", 300))
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("MCP_QUERY_CACHE_MAX_ENTRIES", 1024))
+QUERY_CACHE_TTL_SECONDS = int(os.environ.get("MCP_QUERY_CACHE_TTL_SECONDS", 3600))
+MAX_IN_FLIGHT_GENERATIONS = int(os.environ.get("MCP_MAX_IN_FLIGHT", 8))
+GENERATION_TIMEOUT_SECONDS = float(os.environ.get("MCP_GENERATION_TIMEOUT_SECONDS", 30))
+COMPRESS_CORPUS = os.environ.get("MCP_COMPRESS_CORPUS", "false").lower() == "true"
 
 # Load API key and credentials
 with open("config.json") as f:
     config = json.load(f)
 
-# Configure Gemini
-genai.configure(api_key=config["api_key"])
-model = genai.GenerativeModel("gemini-2.0-flash-001")
+# Configure Gemini on first use; importing the SDK dominates cold start
+def load_model():
+    import google.generativeai as genai
+    genai.configure(api_key=config["api_key"])
+    return genai.GenerativeModel("gemini-2.0-flash-001")
+
+model = LazyResource("gemini", load_model, startup)
+
+storage_backend = get_backend(BUCKET_NAME)
+document_cache = DocumentCache()
+query_cache = QueryCache(QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL_SECONDS)
+generation_gate = GenerationGate(MAX_IN_FLIGHT_GENERATIONS, GENERATION_TIMEOUT_SECONDS)
+
+
+def load_corpus(previous=None):
+    return load_documents_corpus(
+        BUCKET_NAME, storage_backend, document_cache, previous, compress=COMPRESS_CORPUS
+    )
+
+
+def load_initial_corpus():
+    global corpus
+    corpus = load_corpus()
+    return corpus
+
+
+def refresh_corpus_forever():
+    """Background loop that swaps in a new corpus whenever the bucket changes."""
+    global corpus
+    while True:
+        time.sleep(REFRESH_INTERVAL_SECONDS)
+        try:
+            if not initial_corpus.ready:
+                # The warm-up load failed; keep retrying until there is a first version
+                initial_corpus.get()
+                continue
+            corpus = load_corpus(corpus)
+        except Exception as e:
+            print(f"[ERROR] Corpus refresh failed, keeping version {corpus.version if corpus else None}: {e}")
 
-# Load both manuals and forms from GCS
-manuals_cache = download_documents("airline_data_mcp", prefix="manuals/")
-forms_cache = download_documents("airline_data_mcp", prefix="forms/")
 
 app = FastAPI()
+install_fastapi(app, "mcp_server")
+
+# Both manuals and forms are loaded from storage by the warm-up, after the server is listening
+corpus = None
+initial_corpus = LazyResource("corpus", load_initial_corpus, startup)
+install_fastapi_health_endpoints(app, [initial_corpus, model], startup)
+
+@app.on_event("startup")
+def start_corpus_refresh():
+    warm_up(initial_corpus, model)
+    if REFRESH_INTERVAL_SECONDS > 0:
+        threading.Thread(target=refresh_corpus_forever, daemon=True).start()
+
+def select_corpus(user_query, current):
+    """Picks the (name, index) pair a query should be answered from."""
+    if "form" in user_query.lower():
+        return "forms", current.forms
+    elif "manual" in user_query.lower():
+        return "manuals", current.manuals
+    else:
+        return "combined", current.combined
 
 @app.post("/query")
 async def handle_query(request: Request):
     data = await request.json()
     user_query = data.get("query", "")
+    current = corpus  # one consistent snapshot even if a refresh swaps it mid-request
+    if current is None and not STARTUP_WARM_UP:
+        # Nothing loads the corpus ahead of time, so the first query does
+        try:
+            current = await asyncio.to_thread(initial_corpus.get)
+        except Exception as e:
+            return JSONResponse({"error": f"Corpus failed to load: {str(e)}"}, status_code=503)
+    if current is None:
+        return JSONResponse({"error": "Corpus is still loading, retry shortly"}, status_code=503)
 
-    if "form" in user_query.lower():
-        prompt = build_prompt(user_query, forms_cache)
-    elif "manual" in user_query.lower():
-        prompt = build_prompt(user_query, manuals_cache)
-    else:
-        combined_docs = {**manuals_cache, **forms_cache}
-        prompt = build_prompt(user_query, combined_docs)
+    corpus_name, index = select_corpus(user_query, current)
+
+    async def answer():
+        prompt = build_prompt(user_query, index)
+        # Async client call, so a slow generation never blocks the event loop
+        response = await generation_gate.run(
+            lambda: call_llm_async("gemini-2.0-flash-001", "answer", model.get().generate_content_async, prompt)
+        )
+        return response.text
 
     try:
-        response = model.generate_content(prompt)
-        return {"response": response.text}
+        key = QueryCache.make_key(user_query, corpus_name, current.version)
+        return {"response": await query_cache.get_or_compute(key, answer)}
+    except asyncio.TimeoutError:
+        return JSONResponse(
+            {"error": f"Generation timed out after {GENERATION_TIMEOUT_SECONDS}s"}, status_code=504
+        )
     except Exception as e:
         return {"error": str(e)}
 
+@app.get("/cache_stats")
+async def cache_stats():
+    return {"corpus_version": corpus.version if corpus else None, **query_cache.stats()}
+
+@app.get("/generation_stats")
+async def generation_stats():
+    return generation_gate.stats()
+
+startup.mark("module_loaded")
+
 if __name__ == "__main__":
+    import uvicorn
     port = int(os.environ.get("PORT", 8080))
     uvicorn.run("main:app", host="0.0.0.0", port=port)
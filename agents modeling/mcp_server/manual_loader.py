@@ -1,19 +1,31 @@
-from google.cloud import storage
+import hashlib
 import fitz
 import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from corpus_store import build_corpus
+from retrieval import PAGE_BREAK
+from storage_backends import get_backend
 
-def load_text_from_pdf(blob):
-    with blob.open("rb") as f:
-        pdf_bytes = f.read()
+# Modules shared by all agents live in "agents modeling/shared"
+sys.path.append(os.environ.get(
+    "AGENTS_SHARED_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared")
+))
+from instrumentation import observe_document, observe_document_load
+
+SUPPORTED_EXTENSIONS = (".pdf", ".json")
+LOADER_WORKERS = int(os.environ.get("MCP_LOADER_WORKERS", os.cpu_count() or 4))
+
+def load_text_from_pdf_bytes(pdf_bytes):
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
-
-def load_text_from_json(blob):
-    raw = blob.download_as_text(encoding="utf-8")
-    obj = json.loads(raw)
+    # Keep page boundaries so the retrieval index can chunk per page
+    return PAGE_BREAK.join(page.get_text() for page in doc)
+
+def load_text_from_json_bytes(raw_bytes):
+    obj = json.loads(raw_bytes.decode("utf-8"))
     # Flatten the JSON object into readable text for LLM prompt
     return json.dumps(obj, indent=2)
 
@@ -21,52 +33,146 @@ def extract_text_from_pdf_bytes(pdf_bytes):
     doc = fitz.open(stream=pdf_bytes, filetype="pdf")
     return "\n".join(page.get_text() for page in doc)
 
-def download_documents(bucket_name, prefix):
-    client = storage.Client()
-    bucket = client.bucket(bucket_name)
-    blobs = bucket.list_blobs(prefix=prefix)
+def list_documents(backend, prefix):
+    """Returns {name: version} for the supported documents under prefix."""
+    return {
+        name: version
+        for name, version in backend.list_blobs(prefix).items()
+        if name.endswith(SUPPORTED_EXTENSIONS)
+    }
 
-    content = {}
-    for blob in blobs:
-        if blob.name.endswith("/"):
-            continue  # skip folders
+def corpus_fingerprint(*listings):
+    """Hashes one or more {name: version} listings into a single corpus version."""
+    digest = hashlib.sha256()
+    for listing in listings:
+        for name in sorted(listing):
+            digest.update(f"{name}\0{listing[name]}\n".encode("utf-8"))
+    return digest.hexdigest()[:16]
 
-        if blob.name.endswith(".pdf"):
-            try:
-                content[blob.name] = load_text_from_pdf(blob)
-            except Exception as e:
-                content[blob.name] = f"Error reading PDF: {e}"
+def _parse_document(name, raw_bytes):
+    """Parses fetched bytes into text; runs inside the process pool for PDFs."""
+    if name.endswith(".pdf"):
+        return load_text_from_pdf_bytes(raw_bytes)
+    return load_text_from_json_bytes(raw_bytes)
 
-        elif blob.name.endswith(".json"):
-            try:
-                content[blob.name] = load_text_from_json(blob)
-            except Exception as e:
-                content[blob.name] = f"Error reading JSON: {e}"
+def _error_text(name, error):
+    kind = "PDF" if name.endswith(".pdf") else "JSON"
+    return f"Error reading {kind}: {error}"
+
+def download_documents(bucket_name, prefix, backend=None, cache=None, listing=None, workers=None):
+    """
+    Loads every PDF/JSON document under prefix as {name: text}.
+
+    With a DocumentCache, only blobs whose name/version is not cached yet are
+    fetched and parsed. Pass a listing from list_documents to skip re-listing.
+    Blobs are fetched on a thread pool and PDFs are parsed on a process pool,
+    both sized by workers (default MCP_LOADER_WORKERS).
+    """
+    backend = backend or get_backend(bucket_name)
+    if listing is None:
+        listing = list_documents(backend, prefix)
+    workers = workers or LOADER_WORKERS
+
+    texts = {}
+    misses = []
+    for name, version in listing.items():
+        cached = cache.get(name, version) if cache else None
+        if cached is not None:
+            texts[name] = cached
+        else:
+            misses.append(name)
+
+    if misses:
+        parsed = set()
+        needs_processes = any(name.endswith(".pdf") for name in misses)
+        with ThreadPoolExecutor(max_workers=workers) as io_pool, \
+                (ProcessPoolExecutor(max_workers=workers) if needs_processes else nullcontext()) as cpu_pool:
+            fetches = {io_pool.submit(backend.read_bytes, name): name for name in misses}
+            parses = {}
+            for future in as_completed(fetches):
+                name = fetches[future]
+                try:
+                    raw_bytes = future.result()
+                except Exception as e:
+                    observe_document(failed=True)
+                    texts[name] = _error_text(name, e)
+                    continue
+                observe_document(size=len(raw_bytes))
+                if name.endswith(".pdf"):
+                    parses[cpu_pool.submit(_parse_document, name, raw_bytes)] = name
+                else:
+                    # JSON flattening is cheap; not worth pickling to a process
+                    try:
+                        texts[name] = _parse_document(name, raw_bytes)
+                        parsed.add(name)
+                    except Exception as e:
+                        observe_document(failed=True)
+                        texts[name] = _error_text(name, e)
+
+            for future in as_completed(parses):
+                name = parses[future]
+                try:
+                    texts[name] = future.result()
+                    parsed.add(name)
+                except Exception as e:
+                    observe_document(failed=True)
+                    texts[name] = _error_text(name, e)
+
+        if cache:
+            for name in parsed:
+                cache.put(name, listing[name], texts[name])
+
+    # Preserve listing order regardless of completion order
+    return {name: texts[name] for name in listing}
+
+def load_corpus(bucket_name, backend=None, cache=None, previous=None, compress=False):
+    """
+    Lists manuals/ and forms/, and (re)builds the corpus only if any blob changed.
+    Unchanged blobs are served from the on-disk document cache.
+    """
+    started = time.perf_counter()
+    backend = backend or get_backend(bucket_name)
+    manuals_listing = list_documents(backend, "manuals/")
+    forms_listing = list_documents(backend, "forms/")
+    version = corpus_fingerprint(manuals_listing, forms_listing)
+    observe_document_load("list", time.perf_counter() - started)
+    if previous is not None and previous.version == version:
+        return previous
+
+    download_started = time.perf_counter()
+    manuals = download_documents(bucket_name, "manuals/", backend, cache, manuals_listing)
+    forms = download_documents(bucket_name, "forms/", backend, cache, forms_listing)
+    if cache:
+        cache.prune([manuals_listing, forms_listing])
+    observe_document_load("download", time.perf_counter() - download_started)
+
+    # The raw dicts are dropped once packed into the store
+    build_started = time.perf_counter()
+    corpus = build_corpus(version, manuals, forms, compress=compress)
+    observe_document_load("build", time.perf_counter() - build_started)
+    observe_document_load("total", time.perf_counter() - started)
+    print(f"--- MCP: Loaded corpus {version} ({len(manuals)} manuals, {len(forms)} forms, "
+          f"{corpus.store.nbytes()} bytes of text) ---")
+    return corpus
 
-    return content
-    
 def download_manuals(bucket_name, prefix='manuals/'):
-    client = storage.Client()
-    bucket = client.bucket(bucket_name)
-    blobs = bucket.list_blobs(prefix=prefix)
+    backend = get_backend(bucket_name)
 
     manuals = {}
-    for blob in blobs:
-        if blob.name.endswith("/"):
-            continue
-        
-        if blob.name.lower().endswith(".pdf"):
+    for name in backend.list_blobs(prefix):
+        if name.lower().endswith(".pdf"):
             try:
-                pdf_bytes = blob.download_as_bytes()
+                pdf_bytes = backend.read_bytes(name)
                 content = extract_text_from_pdf_bytes(pdf_bytes)
-                manuals[blob.name] = content
+                manuals[name] = content
             except Exception as e:
-                print(f"[ERROR] Failed to parse PDF {blob.name}: {e}")
+                print(f"[ERROR] Failed to parse PDF {name}: {e}")
         else:  # assume it's a text file
+            raw = backend.read_bytes(name)
             try:
-                content = blob.download_as_text(encoding="utf-8")
+                content = raw.decode("utf-8")
             except UnicodeDecodeError:
-                content = blob.download_as_text(encoding="latin1")
-            manuals[blob.name] = content
-    
-    return manuals
\ No newline at end of file
+                content = raw.decode("latin1")
+            manuals[name] = content
+
+    return manuals
@@ -1,15 +1,30 @@
-def build_prompt(user_query, manuals_dict, max_chars=8000):
+def build_context(user_query, index, max_chars=8000, top_k=8):
+    """Joins the top-ranked chunks for user_query that fit in max_chars."""
+    results = index.search(user_query, top_k=top_k)
+    if results:
+        chunks = [chunk for _, chunk in results]
+    else:
+        # Nothing matched the query terms; fall back to the leading chunks
+        chunks = index.chunks[:top_k]
+
     context_parts = []
     total_chars = 0
 
-    for name, text in manuals_dict.items():
-        if total_chars >= max_chars:
-            break
-        chunk = f"\n--- {name} ---\n{text}"
-        context_parts.append(chunk)
-        total_chars += len(chunk)
+    for chunk in chunks:
+        header = f"\n--- {index.name(chunk)} (page {chunk.page}) ---\n"
+        if total_chars + len(header) + chunk.end - chunk.start > max_chars:
+            continue
+        # Only chunks that fit are sliced out of the corpus store
+        part = header + index.text(chunk)
+        context_parts.append(part)
+        total_chars += len(part)
+
+    return "\n".join(context_parts)
+
 
-    context = "\n".join(context_parts)
+def build_prompt(user_query, index, max_chars=8000, top_k=8):
+    """Builds the Gemini prompt from the top-ranked chunks that fit in max_chars."""
+    context = build_context(user_query, index, max_chars, top_k)
     return f"""You are a smart assistant helping airline personnel troubleshoot issues based on technical manuals.
 
 Context:
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query, used for cache keys."""
+    return " ".join(query.lower().split())
+
+
+class QueryCache:
+    """
+    LRU + TTL cache of query responses with single-flight coalescing.
+
+    Concurrent requests for the same key share one in-flight computation;
+    only successful results are stored, so errors are retried next time.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> asyncio.Future
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query, corpus_name, corpus_version):
+        return (normalize_query(query), corpus_name, corpus_version)
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for key, or awaits compute() exactly once.
+        compute() runs in its own task, so a caller that is cancelled (e.g. a
+        client disconnect) does not cancel it for the other waiters.
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.get_running_loop().create_task(self._compute(key, compute))
+            # Mark the exception retrieved so a task nobody awaits any more does not log a warning
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, key, compute):
+        try:
+            value = await compute()
+            self._store(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "in_flight": len(self._inflight),
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,126 @@
+import math
+import re
+from collections import Counter, namedtuple
+
+# Page separator emitted by manual_loader when flattening PDFs
+PAGE_BREAK = "\f"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+PARAGRAPH_PATTERN = re.compile(r"\S(?:.*\S)?(?:\n[ \t]*\S.*)*")
+LINE_PATTERN = re.compile(r"\S.*")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do for from has have how i if in into is it its
+of on or so that the their then there these this to was what when where which
+who why will with you your
+""".split())
+
+# start/end are character offsets into the document held by a CorpusStore
+Chunk = namedtuple("Chunk", ["doc_id", "page", "start", "end"])
+
+
+def tokenize(text):
+    """Lowercases text and returns its alphanumeric terms, minus stopwords."""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _piece_spans(text, start, end, max_chars):
+    """Yields (start, end) spans of paragraphs, breaking oversized ones on lines."""
+    for paragraph in PARAGRAPH_PATTERN.finditer(text, start, end):
+        if paragraph.end() - paragraph.start() <= max_chars:
+            yield paragraph.span()
+            continue
+        for line in LINE_PATTERN.finditer(text, paragraph.start(), paragraph.end()):
+            line_start, line_end = line.span()
+            while line_end - line_start > max_chars:
+                yield line_start, line_start + max_chars
+                line_start += max_chars
+            yield line_start, line_end
+
+
+def split_into_chunks(doc_id, text, max_chunk_chars=1500):
+    """
+    Splits a document into page/section chunk spans.
+
+    Pages (separated by PAGE_BREAK) are never merged; within a page,
+    paragraphs are packed together until the chunk reaches max_chunk_chars.
+    """
+    chunks = []
+    page_start = 0
+    for page_number, page_text in enumerate(text.split(PAGE_BREAK), start=1):
+        page_end = page_start + len(page_text)
+        chunk_start = chunk_end = None
+        for start, end in _piece_spans(text, page_start, page_end, max_chunk_chars):
+            if chunk_start is not None and end - chunk_start > max_chunk_chars:
+                chunks.append(Chunk(doc_id, page_number, chunk_start, chunk_end))
+                chunk_start = None
+            if chunk_start is None:
+                chunk_start = start
+            chunk_end = end
+        if chunk_start is not None:
+            chunks.append(Chunk(doc_id, page_number, chunk_start, chunk_end))
+        page_start = page_end + len(PAGE_BREAK)
+    return chunks
+
+
+class BM25Index:
+    """In-memory inverted index over CorpusStore chunks, scored with Okapi BM25."""
+
+    def __init__(self, store, chunks, k1=1.5, b=0.75):
+        self.store = store
+        self.chunks = list(chunks)
+        self.k1 = k1
+        self.b = b
+
+        # term -> list of (chunk_id, term frequency)
+        self.postings = {}
+        lengths = []
+        for chunk_id, chunk in enumerate(self.chunks):
+            terms = Counter(tokenize(self.text(chunk)))
+            lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings.setdefault(term, []).append((chunk_id, tf))
+
+        n = len(self.chunks)
+        avg_len = (sum(lengths) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(posts) + 0.5) / (len(posts) + 0.5))
+            for term, posts in self.postings.items()
+        }
+        # Length normalisation is query-independent, so fold it in once here
+        self.length_norm = [
+            k1 * (1 - b + b * (length / avg_len if avg_len else 0.0))
+            for length in lengths
+        ]
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def name(self, chunk):
+        return self.store.names[chunk.doc_id]
+
+    def text(self, chunk):
+        return self.store.slice(chunk.doc_id, chunk.start, chunk.end)
+
+    def search(self, query, top_k=8):
+        """Returns up to top_k (score, Chunk) pairs, best first."""
+        scores = {}
+        for term in set(tokenize(query)):
+            posts = self.postings.get(term)
+            if not posts:
+                continue
+            idf = self.idf[term]
+            for chunk_id, tf in posts:
+                score = idf * tf * (self.k1 + 1) / (tf + self.length_norm[chunk_id])
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [(score, self.chunks[chunk_id]) for chunk_id, score in ranked]
+
+
+def build_index(store, doc_ids, max_chunk_chars=1500):
+    """Chunks the given CorpusStore documents and indexes the result."""
+    chunks = []
+    for doc_id in doc_ids:
+        chunks.extend(split_into_chunks(doc_id, store.document(doc_id), max_chunk_chars))
+    return BM25Index(store, chunks)
@@ -0,0 +1,54 @@
+import os
+
+
+class GCSBackend:
+    """Reads documents from a Google Cloud Storage bucket."""
+
+    def __init__(self, bucket_name):
+        from google.cloud import storage
+        self.bucket = storage.Client().bucket(bucket_name)
+
+    def list_blobs(self, prefix):
+        """Returns {blob name: version}, where version is generation + md5."""
+        return {
+            blob.name: f"{blob.generation}-{blob.md5_hash}"
+            for blob in self.bucket.list_blobs(prefix=prefix)
+            if not blob.name.endswith("/")
+        }
+
+    def read_bytes(self, name):
+        return self.bucket.blob(name).download_as_bytes()
+
+
+class LocalDirBackend:
+    """
+    Stands in for a bucket using a local directory, for offline runs and tests.
+    Blob names are paths relative to root, e.g. "manuals/cabin.pdf".
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def list_blobs(self, prefix):
+        """Returns {blob name: version}, where version is mtime + size."""
+        listing = {}
+        base = os.path.join(self.root, prefix)
+        for dirpath, _, filenames in os.walk(base):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                stat = os.stat(path)
+                listing[name] = f"{stat.st_mtime_ns}-{stat.st_size}"
+        return listing
+
+    def read_bytes(self, name):
+        with open(os.path.join(self.root, name), "rb") as f:
+            return f.read()
+
+
+def get_backend(bucket_name):
+    """Uses MCP_LOCAL_DOCS_DIR when set, otherwise the named GCS bucket."""
+    local_dir = os.environ.get("MCP_LOCAL_DOCS_DIR")
+    if local_dir:
+        return LocalDirBackend(local_dir)
+    return GCSBackend(bucket_name)
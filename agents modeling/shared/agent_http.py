@@ -0,0 +1,292 @@
+import random
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import observe_http_client, request_id_headers
+
+# Absolute deadline (Unix epoch seconds) propagated from hop to hop
+DEADLINE_HEADER = "X-Request-Deadline"
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised without calling out while a downstream's breaker is open."""
+
+
+class DeadlineExceededError(requests.exceptions.Timeout):
+    """Raised when the request budget is spent before a call can start."""
+
+
+class Budget:
+    """An end-to-end deadline that every downstream call draws its timeout from."""
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+
+    @classmethod
+    def from_seconds(cls, seconds: float) -> "Budget":
+        return cls(time.time() + seconds)
+
+    @classmethod
+    def from_headers(cls, headers, default_seconds: float) -> "Budget":
+        """Continues the caller's budget if it sent one, else starts a new one."""
+        try:
+            return cls(float(headers[DEADLINE_HEADER]))
+        except (KeyError, TypeError, ValueError):
+            return cls.from_seconds(default_seconds)
+
+    def remaining(self) -> float:
+        return self.deadline - time.time()
+
+    def headers(self) -> dict:
+        return {DEADLINE_HEADER: f"{self.deadline:.3f}"}
+
+
+class MultipartBody:
+    """
+    multipart/form-data body streamed from the callers' buffers.
+
+    files maps field name -> (filename, bytes-like, content type), as with
+    requests' files=. read() hands out memoryview slices, so the upload is
+    sent block by block without building the whole body in memory, and
+    len() lets requests send a Content-Length. post() rewinds it on retry.
+    """
+
+    def __init__(self, files: dict):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        parts = []
+        for name, (filename, content, content_type) in files.items():
+            filename = filename.replace('"', "%22")
+            parts.append((
+                f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f"Content-Type: {content_type}\r\n\r\n"
+            ).encode())
+            parts.extend([content, b"\r\n"])
+        parts.append(f"--{boundary}--\r\n".encode())
+        self._parts = [memoryview(part).cast("B") for part in parts]
+        self._length = sum(len(part) for part in self._parts)
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        # requests only streams bodies that are iterable
+        while block := self.read(65536):
+            yield block
+
+    def seek(self, offset: int, whence: int = 0):
+        if (offset, whence) != (0, 0):
+            raise ValueError("MultipartBody can only be rewound to the start")
+        self._index, self._offset, self._position = 0, 0, 0
+
+    def tell(self) -> int:
+        return self._position
+
+    def read(self, size: int = -1):
+        if size is None or size < 0:
+            return b"".join(self)
+        while self._index < len(self._parts) and self._offset >= len(self._parts[self._index]):
+            self._index, self._offset = self._index + 1, 0
+        if self._index >= len(self._parts):
+            return b""
+        block = self._parts[self._index][self._offset:self._offset + size]
+        self._offset += len(block)
+        self._position += len(block)
+        return block
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_seconds; then lets one trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Ends a call that failed for reasons of our own without counting it either way."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class _Downstream:
+    """Session, breaker and counters for one scheme://host."""
+
+    def __init__(self, target: str, pool_size: int, breaker: CircuitBreaker):
+        self.target = target
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.breaker = breaker
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+
+class AgentHttpClient:
+    """
+    Drop-in for requests.post between agents.
+
+    timeout caps a single attempt; the budget (if given) caps the whole call,
+    retries included. Only calls marked idempotent are retried, on connection
+    errors, timeouts and 429/502/503/504, with full-jitter exponential backoff.
+    """
+
+    def __init__(self, timeout: float = 60.0, max_retries: int = 2, backoff_seconds: float = 0.25,
+                 pool_size: int = 16, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.pool_size = pool_size
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._downstreams = {}
+        self._lock = threading.Lock()
+
+    def _downstream(self, url: str) -> _Downstream:
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            downstream = self._downstreams.get(key)
+            if downstream is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+                downstream = self._downstreams[key] = _Downstream(key, self.pool_size, breaker)
+            return downstream
+
+    def _attempt_timeout(self, budget) -> float:
+        if budget is None:
+            return self.timeout
+        remaining = budget.remaining()
+        if remaining <= 0:
+            raise DeadlineExceededError("Request budget exhausted before calling downstream")
+        return min(self.timeout, remaining)
+
+    def _count(self, downstream: _Downstream, **deltas):
+        with self._lock:
+            for name, amount in deltas.items():
+                setattr(downstream, name, getattr(downstream, name) + amount)
+
+    def post(self, url: str, *, budget: Budget = None, idempotent: bool = False, **kwargs) -> requests.Response:
+        """POSTs to url; raises requests exceptions like requests.post would."""
+        downstream = self._downstream(url)
+        kwargs["headers"] = {**(kwargs.get("headers") or {}), **request_id_headers()}
+        if budget is not None:
+            kwargs["headers"].update(budget.headers())
+        attempts = 1 + (self.max_retries if idempotent else 0)
+
+        for attempt in range(attempts):
+            timeout = self._attempt_timeout(budget)
+            if not downstream.breaker.allow():
+                self._count(downstream, rejected=1)
+                raise CircuitOpenError(f"Circuit open for {url}")
+
+            # Rewind file-like payloads so a retry re-sends the whole body
+            for file_tuple in (kwargs.get("files") or {}).values():
+                if isinstance(file_tuple, tuple) and hasattr(file_tuple[1], "seek"):
+                    file_tuple[1].seek(0)
+            if hasattr(kwargs.get("data"), "seek"):
+                kwargs["data"].seek(0)
+
+            started = time.monotonic()
+            self._count(downstream, requests=1)
+            try:
+                response = downstream.session.post(url, timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._count(downstream, failures=1)
+                downstream.breaker.record_failure()
+                observe_http_client(downstream.target, time.monotonic() - started, error=type(e).__name__)
+                if attempt + 1 >= attempts:
+                    raise
+            except requests.exceptions.RequestException as e:
+                # Not retried, but still recorded: a half-open trial must not stay in flight forever
+                self._count(downstream, failures=1)
+                downstream.breaker.record_failure()
+                observe_http_client(downstream.target, time.monotonic() - started, error=type(e).__name__)
+                raise
+            except BaseException:
+                # e.g. KeyboardInterrupt or SystemExit: not the downstream's fault, but free a half-open trial
+                downstream.breaker.release_trial()
+                raise
+            else:
+                body = response.request.body
+                observe_http_client(
+                    downstream.target, time.monotonic() - started, status=response.status_code,
+                    request_bytes=len(body) if isinstance(body, (bytes, str, MultipartBody)) else None,
+                    response_bytes=len(response.content),
+                )
+                if response.status_code < 500:
+                    downstream.breaker.record_success()
+                else:
+                    self._count(downstream, failures=1)
+                    downstream.breaker.record_failure()
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt + 1 >= attempts:
+                    return response
+            finally:
+                self._count(downstream, total_seconds=time.monotonic() - started)
+
+            self._count(downstream, retries=1)
+            delay = random.uniform(0, self.backoff_seconds * (2 ** attempt))
+            if budget is not None and delay >= budget.remaining():
+                raise DeadlineExceededError("Request budget exhausted before retrying downstream")
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                host: {
+                    "requests": d.requests,
+                    "failures": d.failures,
+                    "retries": d.retries,
+                    "rejected_by_breaker": d.rejected,
+                    "breaker_state": d.breaker.state,
+                    "avg_seconds": d.total_seconds / d.requests if d.requests else 0.0,
+                }
+                for host, d in self._downstreams.items()
+            }
@@ -0,0 +1,340 @@
+import contextvars
+import functools
+import os
+import threading
+import time
+import uuid
+
+# Correlates one user request across every agent it passes through
+REQUEST_ID_HEADER = "X-Request-ID"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+SERVICE_NAME = os.environ.get("SERVICE_NAME", "agent")
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def current_request_id():
+    return _request_id.get()
+
+
+def set_request_id(request_id=None) -> str:
+    """Adopts the caller's request ID, or starts a new one."""
+    request_id = request_id or uuid.uuid4().hex
+    _request_id.set(request_id)
+    return request_id
+
+
+def request_id_headers() -> dict:
+    request_id = current_request_id()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+def with_request_id(fn):
+    """Binds the current request ID to fn, for work handed to a thread pool."""
+    request_id = current_request_id()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        set_request_id(request_id)
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+# --- Metric types ---
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in sorted(values.items())]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        with self._lock:
+            all_series = {key: list(series) for key, series in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(all_series.items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+_registry = []
+
+
+def counter(name: str, help_text: str, labels=()) -> Counter:
+    metric = Counter(name, help_text, labels)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS) -> Histogram:
+    metric = Histogram(name, help_text, labels, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# --- Metrics shared by the agents ---
+
+SERVER_SECONDS = histogram("agent_http_server_request_seconds", "Inbound request latency.",
+                           ("service", "method", "route", "status"))
+NODE_SECONDS = histogram("agent_graph_node_seconds", "LangGraph node latency.", ("service", "graph", "node"))
+NODE_ERRORS = counter("agent_graph_node_errors_total", "LangGraph nodes that raised or returned an error.",
+                      ("service", "graph", "node"))
+HTTP_CLIENT_SECONDS = histogram("agent_http_client_seconds", "Outbound HTTP attempt latency.",
+                                ("service", "target", "status"))
+HTTP_CLIENT_REQUEST_BYTES = histogram("agent_http_client_request_bytes", "Outbound HTTP request body size.",
+                                      ("service", "target"), SIZE_BUCKETS)
+HTTP_CLIENT_RESPONSE_BYTES = histogram("agent_http_client_response_bytes", "Outbound HTTP response body size.",
+                                       ("service", "target"), SIZE_BUCKETS)
+HTTP_CLIENT_ERRORS = counter("agent_http_client_errors_total", "Outbound HTTP attempts that failed to complete.",
+                             ("service", "target", "error"))
+LLM_SECONDS = histogram("agent_llm_call_seconds", "Gemini call latency.", ("service", "model", "operation"))
+LLM_TOKENS = counter("agent_llm_tokens_total", "Gemini tokens reported in usage metadata.",
+                     ("service", "model", "operation", "kind"))
+LLM_ERRORS = counter("agent_llm_errors_total", "Gemini calls that raised.", ("service", "model", "operation"))
+DEPENDENCY_SECONDS = histogram("agent_dependency_call_seconds", "SDK-based dependency call latency (e.g. vector store).",
+                               ("service", "dependency", "operation"))
+DEPENDENCY_ERRORS = counter("agent_dependency_errors_total", "SDK-based dependency calls that raised.",
+                            ("service", "dependency", "operation"))
+DOCUMENT_LOAD_SECONDS = histogram("agent_document_load_seconds", "Corpus document loading time by phase.",
+                                  ("service", "phase"))
+DOCUMENT_BYTES = histogram("agent_document_bytes", "Size of fetched corpus documents.", ("service",), SIZE_BUCKETS)
+DOCUMENT_ERRORS = counter("agent_document_errors_total", "Corpus documents that failed to load.", ("service",))
+
+
+# --- Instrumentation helpers ---
+
+def traced_node(graph: str, node: str, fn):
+    """
+    Wraps a LangGraph node to time it. A node counts as failed if it raises or
+    sets a new "error" / "error_message" in the state it returns.
+    """
+    @functools.wraps(fn)
+    def wrapper(state):
+        started = time.perf_counter()
+        previous_errors = [state.get(key) for key in ("error", "error_message")]
+        failed = True
+        try:
+            result = fn(state)
+            failed = isinstance(result, dict) and any(
+                result.get(key) and result.get(key) != previous
+                for key, previous in zip(("error", "error_message"), previous_errors)
+            )
+            return result
+        finally:
+            NODE_SECONDS.observe(time.perf_counter() - started, service=SERVICE_NAME, graph=graph, node=node)
+            if failed:
+                NODE_ERRORS.inc(service=SERVICE_NAME, graph=graph, node=node)
+    return wrapper
+
+
+def _record_usage(response, model: str, operation: str):
+    usage = getattr(response, "usage_metadata", None)
+    for kind, attribute in (("prompt", "prompt_token_count"), ("completion", "candidates_token_count")):
+        tokens = getattr(usage, attribute, None) if usage is not None else None
+        if tokens:
+            LLM_TOKENS.inc(tokens, service=SERVICE_NAME, model=model, operation=operation, kind=kind)
+
+
+def call_llm(model: str, operation: str, fn, /, *args, **kwargs):
+    """Calls fn (a Gemini SDK call), recording latency, token usage and errors."""
+    started = time.perf_counter()
+    try:
+        response = fn(*args, **kwargs)
+    except Exception:
+        LLM_ERRORS.inc(service=SERVICE_NAME, model=model, operation=operation)
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, service=SERVICE_NAME, model=model, operation=operation)
+    _record_usage(response, model, operation)
+    return response
+
+
+async def call_llm_async(model: str, operation: str, fn, /, *args, **kwargs):
+    """Async variant of call_llm for generate_content_async."""
+    started = time.perf_counter()
+    try:
+        response = await fn(*args, **kwargs)
+    except BaseException:
+        LLM_ERRORS.inc(service=SERVICE_NAME, model=model, operation=operation)
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, service=SERVICE_NAME, model=model, operation=operation)
+    _record_usage(response, model, operation)
+    return response
+
+
+def traced_stream(model: str, operation: str, chunks):
+    """
+    Passes a streaming Gemini response through, timing it until exhausted.
+    Usage metadata is taken from the last chunk that carries it.
+    """
+    started = time.perf_counter()
+    last_chunk = None
+    try:
+        for chunk in chunks:
+            last_chunk = chunk
+            yield chunk
+    except Exception:
+        LLM_ERRORS.inc(service=SERVICE_NAME, model=model, operation=operation)
+        raise
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, service=SERVICE_NAME, model=model, operation=operation)
+    if last_chunk is not None:
+        _record_usage(last_chunk, model, operation)
+
+
+def call_dependency(dependency: str, operation: str, fn, /, *args, **kwargs):
+    """Calls fn (a non-LLM SDK call such as a vector store upsert), recording latency and errors."""
+    started = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        DEPENDENCY_ERRORS.inc(service=SERVICE_NAME, dependency=dependency, operation=operation)
+        raise
+    finally:
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - started, service=SERVICE_NAME,
+                                   dependency=dependency, operation=operation)
+
+
+def observe_http_client(target: str, seconds: float, status=None, error=None, request_bytes=None,
+                        response_bytes=None):
+    """Records one outbound HTTP attempt (called by AgentHttpClient)."""
+    HTTP_CLIENT_SECONDS.observe(seconds, service=SERVICE_NAME, target=target,
+                                status=status if status is not None else "error")
+    if error is not None:
+        HTTP_CLIENT_ERRORS.inc(service=SERVICE_NAME, target=target, error=error)
+    if request_bytes is not None:
+        HTTP_CLIENT_REQUEST_BYTES.observe(request_bytes, service=SERVICE_NAME, target=target)
+    if response_bytes is not None:
+        HTTP_CLIENT_RESPONSE_BYTES.observe(response_bytes, service=SERVICE_NAME, target=target)
+
+
+def observe_document_load(phase: str, seconds: float):
+    DOCUMENT_LOAD_SECONDS.observe(seconds, service=SERVICE_NAME, phase=phase)
+
+
+def observe_document(size: int = None, failed: bool = False):
+    if size is not None:
+        DOCUMENT_BYTES.observe(size, service=SERVICE_NAME)
+    if failed:
+        DOCUMENT_ERRORS.inc(service=SERVICE_NAME)
+
+
+# --- Web framework integration ---
+
+def install_flask(app, service: str = None):
+    """
+    Adds /metrics, request timing and X-Request-ID adoption/echo to a Flask
+    app. The ID is available to outbound calls via current_request_id().
+    """
+    from flask import Response, g, request
+
+    global SERVICE_NAME
+    SERVICE_NAME = service or SERVICE_NAME
+
+    @app.before_request
+    def _start_request():
+        g.request_id = set_request_id(request.headers.get(REQUEST_ID_HEADER))
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.get("request_started")
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            SERVER_SECONDS.observe(time.perf_counter() - started, service=SERVICE_NAME,
+                                   method=request.method, route=route, status=response.status_code)
+        if g.get("request_id"):
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        return Response(render_metrics(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+
+def install_fastapi(app, service: str = None):
+    """FastAPI counterpart of install_flask."""
+    from fastapi import Request
+    from fastapi.responses import PlainTextResponse
+
+    global SERVICE_NAME
+    SERVICE_NAME = service or SERVICE_NAME
+
+    @app.middleware("http")
+    async def _instrument_request(request: Request, call_next):
+        request_id = set_request_id(request.headers.get(REQUEST_ID_HEADER))
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers[REQUEST_ID_HEADER] = request_id
+            return response
+        finally:
+            route = request.scope.get("route")
+            SERVER_SECONDS.observe(time.perf_counter() - started, service=SERVICE_NAME, method=request.method,
+                                   route=getattr(route, "path", "unmatched"), status=status)
+
+    @app.get("/metrics")
+    def metrics_endpoint():
+        return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
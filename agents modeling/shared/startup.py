@@ -0,0 +1,189 @@
+import builtins
+import os
+import runpy
+import sys
+import threading
+import time
+
+# STARTUP_PROFILE=1 logs when each startup phase completes
+STARTUP_PROFILE = os.environ.get("STARTUP_PROFILE", "false").lower() in ("1", "true")
+# STARTUP_WARM_UP=false defers every resource to its first request
+STARTUP_WARM_UP = os.environ.get("STARTUP_WARM_UP", "true").lower() in ("1", "true")
+
+
+def seconds_since_process_start() -> float:
+    """Wall time since the process was created (Linux /proc), else since this module loaded."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.perf_counter() - _MODULE_LOADED
+
+
+_MODULE_LOADED = time.perf_counter()
+
+
+class StartupProfile:
+    """Records when each startup phase finished, relative to process start."""
+
+    def __init__(self, service: str):
+        self.service = service
+        self.phases = {}
+        self.mark("imports")
+
+    def mark(self, phase: str):
+        self.phases[phase] = round(seconds_since_process_start(), 3)
+        if STARTUP_PROFILE:
+            print(f"---STARTUP {self.service}: {phase} at {self.phases[phase]:.3f}s---")
+
+
+class LazyResource:
+    """
+    A client, graph or index built on first use (or by warm_up) exactly once.
+    A failed build is remembered for /readyz and retried on the next get().
+    """
+
+    def __init__(self, name: str, factory, profile: StartupProfile = None):
+        self.name = name
+        self.factory = factory
+        self.profile = profile
+        self.build_seconds = None
+        self.error = None
+        self._value = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def get(self):
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                started = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.build_seconds = round(time.perf_counter() - started, 3)
+                self.error = None
+                self._ready = True
+                if self.profile is not None:
+                    self.profile.mark(self.name)
+        return self._value
+
+    def status(self) -> dict:
+        return {"ready": self._ready, "build_seconds": self.build_seconds, "error": self.error}
+
+
+def warm_up(*resources: LazyResource):
+    """Builds resources in the background so the server can accept connections immediately."""
+    if not STARTUP_WARM_UP:
+        return None
+
+    def run():
+        for resource in resources:
+            try:
+                resource.get()
+            except Exception as e:
+                print(f"---STARTUP: warm-up of {resource.name} failed: {e}---")
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness(resources, profile: StartupProfile = None):
+    """
+    Returns (ready, body) for a readiness probe. With warm-up disabled nothing
+    is built before its first request, so only a failed build holds it back.
+    """
+    if STARTUP_WARM_UP:
+        ready = all(resource.ready for resource in resources)
+    else:
+        ready = not any(resource.error for resource in resources)
+    body = {"status": "ready" if ready else "starting", "resources": {r.name: r.status() for r in resources}}
+    if profile is not None:
+        body["startup_phases"] = profile.phases
+    return ready, body
+
+
+def install_health_endpoints(app, resources, profile: StartupProfile = None):
+    """
+    /healthz (liveness) answers as soon as the process serves HTTP; /readyz
+    (readiness) returns 503 until every warm-up resource has been built.
+    """
+    from flask import jsonify
+
+    @app.route("/healthz", methods=["GET"])
+    def healthz_endpoint():
+        return jsonify({"status": "alive"})
+
+    @app.route("/readyz", methods=["GET"])
+    def readyz_endpoint():
+        ready, body = readiness(resources, profile)
+        return jsonify(body), 200 if ready else 503
+
+
+def install_fastapi_health_endpoints(app, resources, profile: StartupProfile = None):
+    """FastAPI counterpart of install_health_endpoints."""
+    from fastapi.responses import JSONResponse
+
+    @app.get("/healthz")
+    async def healthz_endpoint():
+        return {"status": "alive"}
+
+    @app.get("/readyz")
+    async def readyz_endpoint():
+        ready, body = readiness(resources, profile)
+        return JSONResponse(body, status_code=200 if ready else 503)
+
+
+def profile_imports(script_path: str, top: int = 15):
+    """
+    Import-time profile mode: executes a service module without starting its
+    server and reports total import time plus the slowest imports it makes
+    directly (cumulative, including their own dependencies).
+    """
+    script_path = os.path.abspath(script_path)
+    script_dir = os.path.dirname(script_path)
+    sys.path.insert(0, script_dir)
+    timings = {}
+    original_import = builtins.__import__
+
+    def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        importer = (globals or {}).get("__file__") or ""
+        if not importer.startswith(script_dir) or level or name in sys.modules:
+            return original_import(name, globals, locals, fromlist, level)
+        started = time.perf_counter()
+        try:
+            return original_import(name, globals, locals, fromlist, level)
+        finally:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+    # Only the import itself is measured, not the background warm-up it would start
+    os.environ["STARTUP_WARM_UP"] = "false"
+    builtins.__import__ = timed_import
+    started = time.perf_counter()
+    try:
+        runpy.run_path(script_path, run_name="__startup_profile__")
+    finally:
+        builtins.__import__ = original_import
+    total = time.perf_counter() - started
+
+    print(f"Module import of {os.path.basename(script_path)}: {total:.3f}s "
+          f"({seconds_since_process_start():.3f}s since process start)")
+    for name, seconds in sorted(timings.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {seconds:8.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python startup.py <path to service module>")
+    profile_imports(sys.argv[1])
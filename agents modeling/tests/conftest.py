@@ -0,0 +1,9 @@
+import os
+import sys
+
+AGENTS_MODELING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# The services import their modules by directory, not as packages
+for directory in ("shared", os.path.join("Agents", "Forms Agent"), os.path.join("Agents", "Submission Agent"),
+                  os.path.join("Agents", "Supervisor Agent")):
+    sys.path.insert(0, os.path.abspath(os.path.join(AGENTS_MODELING_DIR, directory)))
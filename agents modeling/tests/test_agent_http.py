@@ -0,0 +1,110 @@
+import io
+import time
+
+import pytest
+import requests
+
+from agent_http import AgentHttpClient, CircuitOpenError, MultipartBody
+
+URL = "http://forms.test/generate_form"
+
+
+def ok_response():
+    response = requests.Response()
+    response.status_code = 200
+    response._content = b"{}"
+    response.request = requests.Request("POST", URL).prepare()
+    return response
+
+
+@pytest.fixture
+def client():
+    return AgentHttpClient(max_retries=0, failure_threshold=1, reset_seconds=0.05)
+
+
+def stub_post(monkeypatch, client, *outcomes):
+    """Makes the downstream's session return or raise each outcome in turn."""
+    outcomes = list(outcomes)
+
+    def post(url, **kwargs):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(client._downstream(URL).session, "post", post)
+
+
+def test_half_open_trial_recovers_after_non_timeout_exception(monkeypatch, client):
+    stub_post(monkeypatch, client,
+              requests.exceptions.ConnectionError("refused"),
+              requests.exceptions.ChunkedEncodingError("truncated"),
+              ok_response())
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.post(URL)
+    with pytest.raises(CircuitOpenError):
+        client.post(URL)
+
+    # The half-open trial fails with an exception that is not a connection error or timeout
+    time.sleep(0.06)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.post(URL)
+    assert client.stats()["http://forms.test"]["breaker_state"] == "open"
+
+    # ...and the next trial is still let through once the reset period passes
+    time.sleep(0.06)
+    assert client.post(URL).status_code == 200
+    assert client.stats()["http://forms.test"]["breaker_state"] == "closed"
+
+
+def test_counters(monkeypatch, client):
+    stub_post(monkeypatch, client, requests.exceptions.InvalidURL("bad"))
+    with pytest.raises(requests.exceptions.InvalidURL):
+        client.post(URL)
+    with pytest.raises(CircuitOpenError):
+        client.post(URL)
+
+    stats = client.stats()["http://forms.test"]
+    assert (stats["requests"], stats["failures"], stats["rejected_by_breaker"]) == (1, 1, 1)
+
+
+def test_interrupt_is_not_an_upstream_failure(monkeypatch, client):
+    stub_post(monkeypatch, client,
+              requests.exceptions.ConnectionError("refused"),
+              KeyboardInterrupt(),
+              ok_response())
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.post(URL)
+    # Interrupted during the half-open trial: not counted, and the trial slot is freed
+    time.sleep(0.06)
+    with pytest.raises(KeyboardInterrupt):
+        client.post(URL)
+    assert client.stats()["http://forms.test"]["failures"] == 1
+    assert client.post(URL).status_code == 200
+    assert client.stats()["http://forms.test"]["breaker_state"] == "closed"
+
+
+def test_multipart_body_streams_and_rewinds():
+    from werkzeug.formparser import parse_form_data
+
+    image = bytes(range(256)) * 1000
+    body = MultipartBody({"image": ("a \"b\".jpg", image, "image/jpeg")})
+    prepared = requests.Request("POST", URL, data=body, headers={"Content-Type": body.content_type}).prepare()
+    assert prepared.headers["Content-Length"] == str(len(body))
+    assert "Transfer-Encoding" not in prepared.headers
+
+    # Reads are zero-copy slices of the caller's buffer
+    assert isinstance(body.read(8192), memoryview)
+    for _ in range(2):  # a retry rewinds and re-sends the whole body
+        body.seek(0)
+        raw = b"".join(iter(lambda: body.read(8192), b""))
+        assert len(raw) == len(body)
+        _, _, files = parse_form_data({
+            "wsgi.input": io.BytesIO(raw), "REQUEST_METHOD": "POST",
+            "CONTENT_TYPE": body.content_type, "CONTENT_LENGTH": str(len(raw)),
+        })
+        upload = files["image"]
+        assert upload.read() == image
+        assert upload.mimetype == "image/jpeg"
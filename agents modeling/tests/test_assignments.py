@@ -0,0 +1,26 @@
+from assignments import AssignmentIndex
+
+
+def write_roster(tmp_path):
+    path = tmp_path / "assignments.csv"
+    path.write_text(
+        "Inspector Name,Inspector ID,Aircraft ID,Date Assigned,Shift,Inspection Zone,Location\n"
+        "John Davis,100001,UA328,8/1/2024,Morning,Cabin,ORD\n"
+        ",,,,,,\n",
+        encoding="utf-8",
+    )
+    return str(path)
+
+
+def test_lookup_by_inspector_id_keys(tmp_path):
+    index = AssignmentIndex(write_roster(tmp_path))
+    assert len(index) == 1
+    for key in ("inspector_id", "Inspector ID", "employee_id"):
+        assignment = index.lookup_user({key: "100001", "date": "2024-08-01"})
+        assert assignment.aircraft_id == "UA328" and assignment.inspection_zone == "Cabin"
+
+
+def test_generic_id_is_not_taken_as_inspector_id(tmp_path):
+    index = AssignmentIndex(write_roster(tmp_path))
+    assert index.lookup_user({"id": "100001", "date": "2024-08-01"}) is None
+    assert index.lookup_user("100001") is None
@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from job_queue import JobQueue
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(run, **kwargs):
+        queue = JobQueue(str(tmp_path / "jobs.db"), run, poll_seconds=0.05, **kwargs)
+        queue.start()
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop(timeout=5)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def test_first_job_on_idle_rate_limited_queue_starts_promptly(make_queue):
+    started = threading.Event()
+    queue = make_queue(lambda payload, attachment, progress: started.set() or {}, workers=4, max_starts_per_second=2)
+
+    # Idle polls must not use up start slots
+    time.sleep(1.0)
+    submitted = time.monotonic()
+    queue.submit({})
+    assert started.wait(5)
+    assert time.monotonic() - submitted < 0.4
+
+
+def test_job_starts_are_spaced_by_rate_limit(make_queue):
+    starts = []
+    lock = threading.Lock()
+
+    def run(payload, attachment, progress):
+        with lock:
+            starts.append(time.monotonic())
+        return {}
+
+    queue = make_queue(run, workers=4, max_starts_per_second=10)
+    for _ in range(4):
+        queue.submit({})
+    wait_for(lambda: queue.stats()["succeeded"] == 4)
+
+    starts.sort()
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    assert min(gaps) >= 0.09
+
+
+def test_waiting_for_a_start_slot_does_not_outlast_the_lease(make_queue):
+    runs = []
+    lock = threading.Lock()
+
+    def run(payload, attachment, progress):
+        with lock:
+            runs.append(payload["n"])
+        return {}
+
+    # Later starts wait longer than the lease; a job claimed before that wait would be re-run
+    queue = make_queue(run, workers=4, max_starts_per_second=4, lease_seconds=0.2)
+    for n in range(4):
+        queue.submit({"n": n})
+    wait_for(lambda: queue.stats()["succeeded"] == 4)
+    time.sleep(0.3)
+
+    assert sorted(runs) == [0, 1, 2, 3]
+    assert queue.started == 4
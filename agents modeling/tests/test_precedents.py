@@ -0,0 +1,54 @@
+import pytest
+
+from precedents import PrecedentIndex, tokenize
+
+# Threshold the Forms Agent uses by default (PRECEDENT_MIN_SCORE)
+MIN_SCORE = 0.6
+
+# Held-out paraphrases of precedent reports: (item, description, expected issue type)
+TRUE_MATCHES = [
+    ("overhead bin", "The handle on the overhead bin is cracked", "Cracked Bin Handle"),
+    ("window shade", "Window shade is stuck halfway and will not move", "Stuck Window Shade"),
+    ("mirror", "Mirror in the lavatory is cracked", "Cracked Mirror"),
+    ("seat cushion", "Upholstery on the seat cushion is torn", "Upholstery Tear"),
+    ("toilet", "Toilet is clogged", "Clogged Toilet"),
+    ("faucet", "Faucet in the galley lavatory is leaking", "Leaking Faucet"),
+    ("seat belt", "Seat belt buckle is inoperative, jammed shut", "Inoperative Seat Belt Buckle"),
+    ("bin lining", "Lining in the overhead bin is loose", "Loose Bin Lining"),
+    ("headphone jack", "Headphone jack is faulty, only static", "Faulty Headphone Jack"),
+    ("reading light", "Reading light is inoperative", "Inoperative Reading Light"),
+    ("fire extinguisher", "Fire extinguisher pin is missing", "Missing Fire Extinguisher Pin"),
+    ("armrest", "Armrest is damaged, broken at the hinge", "Damaged Armrest"),
+]
+
+# Same part as a precedent but different damage (or vice versa); these must go to the LLM
+FALSE_MATCHES = [
+    ("fuselage", "Panel is cracked"),
+    ("overhead bin", "Overhead bin door is dented"),
+    ("window shade", "Window shade torn"),
+    ("seat", "Seat cushion is stained"),
+    ("tray table", "Tray table is cracked"),
+    ("mirror", "Mirror is dirty"),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return PrecedentIndex.from_file()
+
+
+@pytest.mark.parametrize("item, description, issue_type", TRUE_MATCHES)
+def test_paraphrased_precedent_matches(index, item, description, issue_type):
+    score, report = index.best_match(item, description)
+    assert report is not None and report["Issue Type"] == issue_type
+    assert score >= MIN_SCORE
+
+
+@pytest.mark.parametrize("item, description", FALSE_MATCHES)
+def test_different_damage_on_same_part_does_not_match(index, item, description):
+    score, report = index.best_match(item, description)
+    assert score < MIN_SCORE, report and report["Issue Type"]
+
+
+def test_damage_synonyms_are_folded():
+    assert tokenize("torn ripped jammed cracked") == ["tear", "tear", "stuck", "crack"]
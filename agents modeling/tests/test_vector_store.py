@@ -0,0 +1,103 @@
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+from vector_store import LocalVectorStore
+
+DIMENSIONS = 16
+
+
+def random_vectors(count, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, DIMENSIONS)).astype(np.float32)
+
+
+def fill(store, vectors, prefix="v"):
+    store.upsert([(f"{prefix}{i}", vector, {"i": i}) for i, vector in enumerate(vectors)])
+
+
+def test_ivf_recall_matches_flat(tmp_path):
+    vectors = random_vectors(2000)
+    flat = LocalVectorStore(str(tmp_path / "flat"), DIMENSIONS, mode="flat")
+    ivf = LocalVectorStore(str(tmp_path / "ivf"), DIMENSIONS, mode="ivf", nlist=16, nprobe=8, ivf_min_vectors=100)
+    fill(flat, vectors)
+    fill(ivf, vectors)
+    ivf.rebuild_ivf()
+
+    hits = 0
+    for query in random_vectors(50, seed=1):
+        expected = {vector_id for vector_id, _, _ in flat.query(query, top_k=10)}
+        found = {vector_id for vector_id, _, _ in ivf.query(query, top_k=10)}
+        hits += len(expected & found)
+    assert hits / 500 >= 0.9
+
+
+def test_ivf_rebuilds_in_background_and_serves_meanwhile(tmp_path):
+    store = LocalVectorStore(str(tmp_path), DIMENSIONS, mode="ivf", nlist=8, nprobe=8, ivf_min_vectors=100)
+    vectors = random_vectors(500)
+    fill(store, vectors)
+
+    # The query that triggers the rebuild is answered exactly without waiting for it
+    assert store.query(vectors[7], top_k=1)[0][0] == "v7"
+    deadline = time.monotonic() + 10
+    while store.stats()["ivf_rebuilding"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.stats()["ivf_rows"] == 500
+    assert store.query(vectors[7], top_k=1)[0][0] == "v7"
+
+
+def test_reopen_keeps_vectors_and_metadata(tmp_path):
+    vectors = random_vectors(300)
+    store = LocalVectorStore(str(tmp_path), DIMENSIONS)
+    fill(store, vectors)
+    before = store.query(vectors[42], top_k=5)
+
+    reopened = LocalVectorStore(str(tmp_path), DIMENSIONS)
+    assert reopened.count == 300
+    after = reopened.query(vectors[42], top_k=5)
+    assert [(vector_id, metadata) for vector_id, _, metadata in after] == \
+        [(vector_id, metadata) for vector_id, _, metadata in before]
+    assert [score for _, score, _ in after] == pytest.approx([score for _, score, _ in before], abs=1e-5)
+    assert before[0][0] == "v42" and before[0][2] == {"i": 42}
+
+
+def test_failed_upsert_leaves_no_row_gap(tmp_path, monkeypatch):
+    store = LocalVectorStore(str(tmp_path), DIMENSIONS)
+    fill(store, random_vectors(3))
+
+    def broken_dumps(value):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr("vector_store.json.dumps", broken_dumps)
+    with pytest.raises(sqlite3.OperationalError):
+        store.upsert([("late", random_vectors(1, seed=2)[0], {})])
+    monkeypatch.undo()
+
+    assert store.count == 3
+    store.upsert([("late", random_vectors(1, seed=2)[0], {})])
+    assert store.count == 4
+    assert LocalVectorStore(str(tmp_path), DIMENSIONS).count == 4
+
+
+@pytest.mark.parametrize("top_k, expected", [(0, 0), (-3, 0), (1, 1), (1000, 20)])
+def test_top_k_bounds(tmp_path, top_k, expected):
+    vectors = random_vectors(20)
+    store = LocalVectorStore(str(tmp_path), DIMENSIONS)
+    fill(store, vectors)
+    assert len(store.query(vectors[0], top_k=top_k)) == expected
+
+
+def test_stores_sharing_a_directory_do_not_reuse_rows(tmp_path):
+    # Two processes opened on the same directory, e.g. the reloader parent and child
+    first = LocalVectorStore(str(tmp_path), DIMENSIONS)
+    second = LocalVectorStore(str(tmp_path), DIMENSIONS)
+    vectors = random_vectors(4)
+    first.upsert([("a", vectors[0], {})])
+    second.upsert([("b", vectors[1], {})])
+    first.upsert([("c", vectors[2], {})])
+
+    reopened = LocalVectorStore(str(tmp_path), DIMENSIONS)
+    assert reopened.count == 3
+    for vector_id, vector in zip("abc", vectors):
+        assert reopened.query(vector, top_k=1)[0][0] == vector_id
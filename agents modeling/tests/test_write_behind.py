@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from write_behind import WriteBehindQueue
+
+
+class Recorder:
+    """flush() stand-in that fails any batch containing a poisoned id."""
+
+    def __init__(self, poisoned=()):
+        self.poisoned = set(poisoned)
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, items):
+        ids = [item_id for item_id, _ in items]
+        with self.lock:
+            self.batches.append(ids)
+        if self.poisoned & set(ids):
+            raise RuntimeError("embedding rejected")
+
+    @property
+    def flushed(self):
+        return {item_id for ids in self.batches if not self.poisoned & set(ids) for item_id in ids}
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(flush, **kwargs):
+        options = {"batch_size": 8, "flush_seconds": 0.0, "retry_seconds": 0.01, "max_retry_seconds": 0.05}
+        queue = WriteBehindQueue(str(tmp_path / "journal.db"), flush, **{**options, **kwargs})
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop(timeout=5)
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def test_journaled_reports_survive_a_restart(make_queue):
+    first = make_queue(Recorder())
+    assert first.enqueue("a", {"n": 1})
+    assert not first.enqueue("a", {"n": 2})
+
+    recorder = Recorder()
+    second = make_queue(recorder)
+    second.start()
+    wait_for(lambda: second.pending_count() == 0)
+    assert recorder.batches == [["a"]]
+
+
+def test_failing_batch_is_halved_to_isolate_the_poisoned_report(make_queue):
+    recorder = Recorder(poisoned={"r5"})
+    queue = make_queue(recorder, max_attempts=2)
+    for i in range(8):
+        queue.enqueue(f"r{i}", {})
+    queue.start()
+
+    wait_for(lambda: queue.pending_count() == 0)
+    assert queue.stats()["failed"] == 1
+    assert recorder.flushed == {f"r{i}" for i in range(8)} - {"r5"}
+    assert len(recorder.batches[0]) == 8 and len(recorder.batches[1]) == 4
+    # The poisoned report ends up on its own; the reports around it went in batches
+    assert recorder.batches.count(["r5"]) == 2
+
+
+def test_poisoned_report_backs_off_exponentially(make_queue):
+    queue = make_queue(Recorder(poisoned={"bad"}), retry_seconds=10, max_retry_seconds=300, max_attempts=5)
+    queue.enqueue("bad", {})
+    queue._record_failure("bad", "first")
+    queue._record_failure("bad", "second")
+
+    with queue._connect() as conn:
+        attempts, next_attempt_at, last_error = conn.execute(
+            "SELECT attempts, next_attempt_at, last_error FROM pending WHERE item_id = 'bad'"
+        ).fetchone()
+    assert attempts == 2 and last_error == "second"
+    assert next_attempt_at - time.time() == pytest.approx(20, abs=1)
+    assert queue.stats()["backing_off"] == 1
+
+
+def test_dead_lettered_report_can_be_requeued(make_queue):
+    recorder = Recorder(poisoned={"bad"})
+    queue = make_queue(recorder, max_attempts=2)
+    queue.enqueue("bad", {})
+    queue.start()
+    wait_for(lambda: queue.stats()["failed"] == 1)
+    assert queue.stats()["dead_lettered"] == 1
+
+    recorder.poisoned.clear()
+    assert queue.requeue_failed() == 1
+    wait_for(lambda: queue.pending_count() == 0)
+    assert queue.stats()["failed"] == 0
+    assert "bad" in recorder.flushed
+
+
+def test_record_failure_ignores_a_report_that_is_gone(make_queue):
+    queue = make_queue(Recorder())
+    queue._record_failure("missing", "boom")
+    assert queue.stats()["dead_lettered"] == 0
+
+
+def test_flusher_survives_journal_errors(make_queue, monkeypatch):
+    recorder = Recorder()
+    queue = make_queue(recorder)
+    real_next_batch = queue._next_batch
+    errors = [sqlite3.OperationalError("database is locked")]
+
+    def flaky_next_batch():
+        if errors:
+            raise errors.pop()
+        return real_next_batch()
+
+    monkeypatch.setattr(queue, "_next_batch", flaky_next_batch)
+    queue.enqueue("a", {})
+    queue.start()
+    wait_for(lambda: queue.pending_count() == 0)
+    assert recorder.flushed == {"a"}
+    assert queue.last_error == "database is locked"